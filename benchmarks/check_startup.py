@@ -0,0 +1,69 @@
+"""
+Check that '--help' and argument errors of the 3201 utility start quickly.
+
+Runs the utility with 'python -X importtime' and fails if any heavy library is imported before a subcommand runs, or if
+the imports take longer than the time budget.
+"""
+import argparse
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+# Libraries which must only be imported once a subcommand runs
+HEAVY_MODULES = ['pandas', 'numpy', 'xlsxwriter', 'openpyxl', 'xlrd', 'pyarrow', 'python_calamine']
+# Command lines that should never need the heavy libraries
+COMMANDS = [['--help'], ['sign-in', '--help'], ['make-checkoffs', '--help'], ['check-pre-labs', '--help'],
+            ['watch', '--help'], ['import-rosters', '--help'], ['not-a-command']]
+
+
+def import_times(arguments: list) -> tuple:
+    """
+Run the utility and measure the time taken to import each top level module
+    :param arguments: The command line arguments of the utility
+    :return: Tuple of a dictionary of top level module name to cumulative import time in microseconds and a list of
+    every module imported
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', str(ROOT / 'ta_utility.py')] + arguments,
+                            cwd=ROOT, capture_output=True, text=True)
+    times = {}
+    modules = []
+    for line in result.stderr.splitlines():
+        # Lines look like 'import time:   self [us] | cumulative | imported package'
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        modules.append(module.strip())
+        if not module.startswith('  '):  # Top level imports are not indented
+            times[module.strip()] = int(cumulative)
+    return times, modules
+
+
+def check(budget: float) -> int:
+    """
+Check every command line in COMMANDS
+    :param budget: The longest the imports of a command line are allowed to take, in seconds
+    :return: 0 if every command line passes, otherwise 1
+    """
+    failures = 0
+    for arguments in COMMANDS:
+        times, modules = import_times(arguments)
+        total = sum(times.values()) / 1e6
+        heavy = sorted({module.split('.')[0] for module in modules} & set(HEAVY_MODULES))
+        passed = not heavy and total <= budget
+        failures += not passed
+        print(f"{'ok' if passed else 'FAIL':<6}{' '.join(arguments):<30}{total:8.3f} s")
+        if heavy:
+            print(f"\tHeavy modules imported: {', '.join(heavy)}")
+        if total > budget:
+            slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:5]
+            print(f"\tSlowest imports: {', '.join(f'{module} ({time / 1e6:.3f} s)' for module, time in slowest)}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the start up time of the 3201 utility")
+    parser.add_argument('--budget', type=float, default=0.15,
+                        help="Longest the imports of each command line may take in seconds (default: 0.15)")
+    args = parser.parse_args()
+    exit(check(args.budget))
@@ -0,0 +1,160 @@
+"""
+Generate synthetic section lists and Grade Center exports for benchmarking the 3201 utility.
+
+Section lists have the same columns as the BlackBoard class lists and Grade Center exports have the seven BlackBoard
+student columns followed by the assignment columns, so the assignment being checked is at column index 7.
+"""
+import argparse
+import pathlib
+import warnings
+
+import numpy as np
+import pandas as pd
+
+FIRST_NAMES = ['Aaliyah', 'Ahmed', 'Alejandro', 'Amelia', 'Ana', 'Andrew', 'Ava', 'Benjamin', 'Carlos', 'Charlotte',
+               'Chen', 'Daniel', 'David', 'Elijah', 'Emily', 'Emma', 'Ethan', 'Fatima', 'Gabriel', 'Grace', 'Hannah',
+               'Hiroshi', 'Isabella', 'Jacob', 'James', 'Jose', 'Kevin', 'Layla', 'Liam', 'Lucas', 'Maria', 'Mason',
+               'Mei', 'Mia', 'Mohammed', 'Noah', 'Olivia', 'Priya', 'Rahul', 'Samuel', 'Sofia', 'Sophia', 'Wei',
+               'William', 'Yusuf', 'Zoe']
+LAST_NAMES = ['Adams', 'Ali', 'Anderson', 'Brown', 'Chen', 'Clark', 'Davis', 'Garcia', 'Gonzalez', 'Hall', 'Harris',
+              'Hernandez', 'Jackson', 'Johnson', 'Jones', 'Khan', 'Kim', 'Lee', 'Lewis', 'Lopez', 'Martin', 'Martinez',
+              'Miller', 'Moore', 'Nguyen', 'Patel', 'Perez', 'Robinson', 'Rodriguez', 'Sanchez', 'Singh', 'Smith',
+              'Taylor', 'Thomas', 'Thompson', 'Walker', 'White', 'Williams', 'Wilson', 'Wright', 'Young', 'Zhang']
+STUDENT_COLUMNS = ['Last Name', 'First Name', 'Username', 'Student ID', 'Last Access', 'Availability',
+                   'Weighted Total [Total Pts: up to 0] |1']
+FORMATS = ['csv', 'xls', 'xlsx']
+
+
+def generate_students(students: int, seed: int = 0) -> pd.DataFrame:
+    """
+Make a table of students with realistic, mostly unique names
+    :param students: Number of students
+    :param seed: Seed for the random generator
+    :return: Data frame with the last name, first name and username of each student
+    """
+    rng = np.random.default_rng(seed)
+    last = rng.choice(LAST_NAMES, students)
+    first = rng.choice(FIRST_NAMES, students)
+    # Add a middle initial to most students so that names are mostly unique, like a real class
+    initials = rng.choice(list('ABCDEFGHJKLMNPRSTW') + [''] * 4, students)
+    first = [f"{name} {initial}." if initial else name for name, initial in zip(first, initials)]
+    return pd.DataFrame({'Last Name': last,
+                         'First Name': first,
+                         'Username': [f"user{number:06d}" for number in range(students)]})
+
+
+def grade_center_export(students: pd.DataFrame, grade_columns: int, missing_rate: float,
+                        rng: np.random.Generator) -> pd.DataFrame:
+    """
+Make a Grade Center export for every student in the class
+    :param students: The students in the class
+    :param grade_columns: Number of assignment columns, the first is the assignment being checked
+    :param missing_rate: Fraction of assignments which are not submitted
+    :param rng: The random generator to use
+    :return: Data frame in the column layout of a Grade Center download
+    """
+    count = students.shape[0]
+    export = pd.DataFrame({
+        STUDENT_COLUMNS[0]: students['Last Name'],
+        STUDENT_COLUMNS[1]: students['First Name'],
+        STUDENT_COLUMNS[2]: students['Username'],
+        STUDENT_COLUMNS[3]: rng.integers(10_000_000, 99_999_999, count),
+        STUDENT_COLUMNS[4]: '2021-10-01 12:00:00',
+        STUDENT_COLUMNS[5]: 'Available',
+        STUDENT_COLUMNS[6]: '',
+    })
+    grades = rng.integers(0, 11, (count, grade_columns)).astype(float)
+    grades[rng.random((count, grade_columns)) < missing_rate] = np.nan
+    assignment_columns = [f"Assignment {number + 1} [Total Pts: 10 Score] |{100000 + number}"
+                          for number in range(grade_columns)]
+    return pd.concat([export, pd.DataFrame(grades, columns=assignment_columns)], axis=1)
+
+
+def write_table(data: pd.DataFrame, file_stem: pathlib.Path, file_format: str) -> pathlib.Path:
+    """
+Write a table in one of the input formats of the utility
+    :param data: The table to write
+    :param file_stem: The path of the file without an extension
+    :param file_format: One of 'csv', 'xls' or 'xlsx'
+    :return: The path of the written file
+    """
+    file = file_stem.with_suffix('.' + file_format)
+    if file_format == 'csv':
+        data.to_csv(file, index=False)
+    elif file_format == 'xls':
+        # Writing XLS needs the xlwt engine, which only older versions of pandas support
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            data.to_excel(file, index=False, engine='xlwt')
+    else:
+        data.to_excel(file, index=False)
+    return file
+
+
+def write_dataset(folder: pathlib.Path,
+                  sections: int = 10,
+                  students: int = 300,
+                  assignments: int = 3,
+                  grade_columns: int = 20,
+                  missing_rate: float = 0.1,
+                  file_format: str = 'csv',
+                  seed: int = 0) -> dict:
+    """
+Write section lists, Grade Center exports and a checkoff list in the default folder layout of the utility
+    :param folder: The folder to write 'section_lists/', 'pre_lab_lists/' and 'checkoff_lists/' inside of
+    :param sections: Number of lab sections
+    :param students: Number of students across all sections
+    :param assignments: Number of Grade Center exports
+    :param grade_columns: Number of assignment columns in each Grade Center export
+    :param missing_rate: Fraction of assignments which are not submitted
+    :param file_format: One of 'csv', 'xls' or 'xlsx'
+    :param seed: Seed for the random generator
+    :return: Dictionary of the folders and files written
+    """
+    rng = np.random.default_rng(seed)
+    section_folder = folder / 'section_lists'
+    prelab_folder = folder / 'pre_lab_lists'
+    checkoff_folder = folder / 'checkoff_lists'
+    for location in (section_folder, prelab_folder, checkoff_folder):
+        location.mkdir(parents=True, exist_ok=True)
+
+    # Split the class into sections of roughly equal size
+    class_data = generate_students(students, seed=seed)
+    for number, section_data in enumerate(np.array_split(class_data, sections)):
+        section_data = section_data.assign(**{'Student ID': rng.integers(10_000_000, 99_999_999, len(section_data)),
+                                              'Role': 'Student'})
+        write_table(section_data, section_folder / f"Section_{number + 1:03d}", file_format)
+
+    # Each export lists the whole class in a different order, as Grade Center does not sort by section
+    for number in range(assignments):
+        order = rng.permutation(students)
+        export = grade_center_export(class_data.iloc[order].reset_index(drop=True), grade_columns, missing_rate, rng)
+        write_table(export, prelab_folder / f"gc_EECE3201_Prelab_{number + 1}", file_format)
+
+    checkoff_file = checkoff_folder / 'checkoff_lists.csv'
+    pd.DataFrame({f"Lab {lab + 1}": [f"Checkpoint {point + 1}" for point in range(4)] for lab in range(12)}) \
+        .to_csv(checkoff_file, index=False)
+
+    return {'section_lists': section_folder, 'pre_lab_lists': prelab_folder, 'checkoff_list': checkoff_file}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic section lists and Grade Center exports")
+    parser.add_argument('folder', type=pathlib.Path, help="Folder to write the data to")
+    parser.add_argument('--sections', type=int, default=10, help="Number of lab sections (default: 10)")
+    parser.add_argument('--students', type=int, default=300, help="Number of students (default: 300)")
+    parser.add_argument('--assignments', type=int, default=3, help="Number of Grade Center exports (default: 3)")
+    parser.add_argument('--grade-columns', type=int, default=20,
+                        help="Assignment columns in each Grade Center export (default: 20)")
+    parser.add_argument('--missing-rate', type=float, default=0.1,
+                        help="Fraction of assignments not submitted (default: 0.1)")
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='file_format',
+                        help="File format of the data (default: csv)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the random generator (default: 0)")
+    args = parser.parse_args()
+    written = write_dataset(args.folder, sections=args.sections, students=args.students,
+                            assignments=args.assignments, grade_columns=args.grade_columns,
+                            missing_rate=args.missing_rate, file_format=args.file_format, seed=args.seed)
+    for name, location in written.items():
+        print(f"{name}: {location}")
+    exit(0)
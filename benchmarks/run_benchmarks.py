@@ -0,0 +1,243 @@
+"""
+Benchmarks for the 3201 utility, run from the root folder of the project with 'python -m benchmarks.run_benchmarks'.
+
+Each subcommand is timed end to end on synthetic data from benchmarks/generate_data.py, then the stages of a pre-lab
+check and of writing sheets (read, match, frame, format, write) are timed on their own. Results are saved as JSON in
+benchmarks/results/ named after the current commit, and two result files can be compared with '--compare'.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import pathlib
+import platform
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.generate_data import write_dataset
+from libs.helper_functions import get_sorted_csv_or_xls, read_csv_or_xls, column_names, build_name_index, \
+    collect_missing, load_name_frames
+from libs.main_functions import create_sign_in_sheets, make_checkoffs, check_pre_labs
+from libs.roster_cache import read_rosters, clear_memo
+from libs.xlsx_writer import open_workbook, write_sheet, column_widths
+
+RESULTS_FOLDER = pathlib.Path(__file__).parent / 'results'
+FIRST_NAME = 'First Name'
+LAST_NAME = 'Last Name'
+ASSIGNMENT_INDEX = 7
+INPUT_FORMATS = ['csv', 'xls']  # The formats get_sorted_csv_or_xls finds in an input folder
+
+# Number of sections, students, Grade Center exports and grade columns for each scale
+SCALES = {
+    'small': {'sections': 10, 'students': 300, 'assignments': 3, 'grade_columns': 20},
+    'medium': {'sections': 50, 'students': 5000, 'assignments': 5, 'grade_columns': 100},
+    'large': {'sections': 500, 'students': 100000, 'assignments': 5, 'grade_columns': 300},
+}
+
+
+def best_time(function, repeat: int, warm_up: bool = False) -> float:
+    """
+Time a function, keeping the fastest of several runs
+    :param function: The function to time, called without arguments
+    :param repeat: Number of times to run the function
+    :param warm_up: Run the function once before timing it, e.g. to fill the on-disk roster cache
+    :return: The fastest run time in seconds
+    """
+    if warm_up:
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+    times = []
+    for _ in range(repeat):
+        clear_memo()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def end_to_end(data: dict, output: pathlib.Path, repeat: int) -> dict:
+    """
+Time each subcommand from reading the inputs to writing the outputs
+    :param data: The dataset written by write_dataset
+    :param output: Folder to write the outputs to
+    :param repeat: Number of times to run each subcommand
+    :return: Dictionary of subcommand to run time in seconds
+    """
+    names = {'first_name': FIRST_NAME, 'last_name': LAST_NAME, 'force': True}
+    return {
+        'sign-in': best_time(lambda: create_sign_in_sheets(data['section_lists'], output / 'sign_ins.xlsx',
+                                                           use_cache=False, **names), repeat),
+        'make-checkoffs': best_time(lambda: make_checkoffs(data['section_lists'], output / 'checkoffs.xlsx',
+                                                           data['checkoff_list'], None, use_cache=False, **names),
+                                    repeat),
+        'make-checkoffs --all': best_time(lambda: make_checkoffs(data['section_lists'], output / 'checkoffs.xlsx',
+                                                                 data['checkoff_list'], None, use_cache=False,
+                                                                 all_headers=True, **names), repeat),
+        'check-pre-labs': best_time(lambda: check_pre_labs(data['section_lists'], '_Report', data['pre_lab_lists'],
+                                                           output, ASSIGNMENT_INDEX, use_cache=False, **names),
+                                    repeat),
+        'check-pre-labs (cached rosters)': best_time(
+            lambda: check_pre_labs(data['section_lists'], '_Report', data['pre_lab_lists'], output,
+                                   ASSIGNMENT_INDEX, use_cache=True, **names), repeat, warm_up=True),
+    }
+
+
+def stages(data: dict, output: pathlib.Path) -> dict:
+    """
+Time each stage of a pre-lab check and of writing the sign-in sheets
+    :param data: The dataset written by write_dataset
+    :param output: Folder to write the outputs to
+    :return: Dictionary of stage to run time in seconds
+    """
+    timings = {}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        result = function()
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+        return result
+
+    clear_memo()
+    section_list = timed('discover', lambda: get_sorted_csv_or_xls(data['section_lists']))
+    lab_list = timed('discover', lambda: get_sorted_csv_or_xls(data['pre_lab_lists']))
+    rosters = timed('read', lambda: read_rosters(section_list, columns=[FIRST_NAME, LAST_NAME], use_disk_cache=False))
+    name_index = timed('match', lambda: build_name_index(rosters, first_name=FIRST_NAME, last_name=LAST_NAME))
+
+    reports = []
+    for class_file in lab_list:
+        assignment = timed('read', lambda: column_names(class_file)[ASSIGNMENT_INDEX])
+        class_data = timed('read', lambda: read_csv_or_xls(class_file, columns=[FIRST_NAME, LAST_NAME, assignment]))
+        missing = timed('match', lambda: collect_missing(class_data, class_data[assignment].isna(), name_index,
+                                                         first_name=FIRST_NAME, last_name=LAST_NAME))
+        reports.append(timed('frame', lambda: {section: pd.DataFrame(names, columns=['Last Name', 'First Name'])
+                                               for section, names in missing.items()}))
+
+    name_frames = timed('read', lambda: load_name_frames(data['section_lists'], first_name=FIRST_NAME,
+                                                         last_name=LAST_NAME, use_cache=False))
+    sign_ins = timed('frame', lambda: {section: frame.assign(**{header: None for header in
+                                                                ['Time In', 'Time Out', 'Complete?', 'Signature']})
+                                       for section, frame in name_frames.items()})
+    for sheets in reports + [sign_ins]:
+        for frame in sheets.values():
+            timed('format', lambda: column_widths(frame))
+
+    def write_all():
+        for number, sheets in enumerate(reports + [sign_ins]):
+            workbook = open_workbook(output / f"stage_{number}.xlsx")
+            for section, frame in sheets.items():
+                write_sheet(workbook, section, frame, max_last=True, fill_page=True, landscape=True)
+            workbook.close()
+    timed('write', write_all)
+    return timings
+
+
+def current_commit() -> str:
+    """
+Get the short hash of the checked out commit
+    :return: The commit hash, or 'unknown' outside of a git repository
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(scales: list, file_formats: list, repeat: int) -> dict:
+    """
+Run the benchmarks at each scale and input format
+    :param scales: Names of the scales in SCALES to run
+    :param file_formats: Input file formats to run
+    :param repeat: Number of times to run each subcommand
+    :return: Dictionary of results which can be saved as JSON
+    """
+    results = {'commit': current_commit(),
+               'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(),
+               'pandas': pd.__version__,
+               'runs': {}}
+    for scale in scales:
+        for file_format in file_formats:
+            name = f"{scale}-{file_format}"
+            with tempfile.TemporaryDirectory() as folder:
+                folder = pathlib.Path(folder)
+                try:
+                    data = write_dataset(folder, file_format=file_format, **SCALES[scale])
+                except (ImportError, ValueError) as error:  # XLS can only be written with xlwt installed
+                    print(f"Skipping {name}: {error}")
+                    continue
+                output = folder / 'output'
+                output.mkdir()
+                print(f"Running {name}")
+                results['runs'][name] = {'parameters': SCALES[scale],
+                                         'end_to_end': end_to_end(data, output, repeat),
+                                         'stages': stages(data, output)}
+    return results
+
+
+def print_results(results: dict) -> None:
+    """
+Print benchmark results as a table
+    :param results: Results from run
+    """
+    for name, result in results['runs'].items():
+        print(f"\n{name}")
+        for group in ('end_to_end', 'stages'):
+            for metric, seconds in result[group].items():
+                print(f"\t{metric:<35} {seconds:10.4f} s")
+
+
+def compare(old_file: pathlib.Path, new_file: pathlib.Path) -> None:
+    """
+Print the change in each timing between two result files
+    :param old_file: Results of the baseline
+    :param new_file: Results to compare to the baseline
+    """
+    with open(old_file) as file:
+        old = json.load(file)
+    with open(new_file) as file:
+        new = json.load(file)
+    print(f"{'':<50} {old['commit']:>10} {new['commit']:>10}   change")
+    for name, result in new['runs'].items():
+        if name not in old['runs']:
+            continue
+        for group in ('end_to_end', 'stages'):
+            for metric, seconds in result[group].items():
+                before = old['runs'][name][group].get(metric)
+                if before is None:
+                    continue
+                change = (seconds - before) / before * 100 if before else 0
+                print(f"{name + ': ' + metric:<50} {before:10.4f} {seconds:10.4f}   {change:+.1f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the 3201 utility on synthetic data")
+    parser.add_argument('--scale', choices=list(SCALES), nargs='+', default=['small'],
+                        help="Data sizes to run (default: small)")
+    parser.add_argument('--format', choices=INPUT_FORMATS, nargs='+', default=['csv'], dest='file_formats',
+                        help="Input file formats to run (default: csv)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs of each subcommand, the fastest is kept (default: 3)")
+    parser.add_argument('-o', '--output', type=pathlib.Path, default=None,
+                        help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', type=pathlib.Path, nargs=2, metavar=('OLD', 'NEW'),
+                        help="Compare two results files instead of running the benchmarks")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        exit(0)
+
+    benchmark_results = run(args.scale, args.file_formats, args.repeat)
+    print_results(benchmark_results)
+    results_file = args.output or RESULTS_FOLDER / f"{benchmark_results['commit']}.json"
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, 'w') as file:
+        json.dump(benchmark_results, file, indent=2)
+    print(f"\nResults saved to {results_file}")
+    exit(0)
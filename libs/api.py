@@ -0,0 +1,205 @@
+"""
+In-memory interface to the 3201 utility. Works on data frames and file-like objects instead of folders of files, and
+returns data frames or Excel files in memory, so nothing is written to disk.
+
+Each function takes rosters as a dictionary of section name to either a data frame or a file-like object (or bytes)
+holding a class list. Results are dictionaries of section name to data frame, which to_xlsx turns into a workbook.
+"""
+import io
+import pandas as pd
+
+from libs.helper_functions import _select_columns, build_name_index, collect_missing, name_sheet_frames
+from libs.name_matching import FuzzyNameIndex, FuzzyMatchCollector
+from libs.timings import stage
+from libs.xlsx_writer import write_workbook
+
+SIGN_IN_COLUMNS = ['Time In', 'Time Out', 'Complete?', 'Signature']
+REPORT_COLUMNS = ['Last Name', 'First Name']
+MATCH_COLUMN = 'Match'  # Column of the reports saying which Grade Center row a fuzzy match came from
+EXCEL_SIGNATURES = (b'PK\x03\x04', b'\xd0\xcf\x11\xe0')  # Start of .xlsx (zip) and .xls (OLE2) files
+
+
+def _is_excel(buffer) -> bool:
+    """
+Check whether a file-like object holds an Excel file rather than CSV, leaving its position unchanged
+    :param buffer: The file-like object, opened in binary mode
+    :return: True for .xls and .xlsx files
+    """
+    position = buffer.tell()
+    start = buffer.read(4)
+    buffer.seek(position)
+    return isinstance(start, bytes) and start in EXCEL_SIGNATURES
+
+
+def read_table(source, columns: list = None) -> pd.DataFrame:
+    """
+Read a table from a data frame, bytes or a file-like object. Excel files are detected from their contents, anything
+else is read as CSV.
+    :param source: A data frame, bytes or a file-like object (binary or text) holding a CSV, XLS or XLSX file
+    :param columns: Column headers or positions to keep, in file order. Headers that are not present are left out.
+    :return: The table as a data frame
+    """
+    if isinstance(source, pd.DataFrame):
+        data = source
+    else:
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        data = pd.read_excel(source) if _is_excel(source) else pd.read_csv(source)
+    if columns is not None:
+        data = data.iloc[:, _select_columns(list(data.columns), columns)]
+    return data
+
+
+def load_rosters(rosters: dict, first_name: str, last_name: str) -> dict:
+    """
+Read the name columns of every section
+    :param rosters: Dictionary of section name to the class list of that section (see read_table)
+    :param first_name: The name of the column header for first names in the class lists
+    :param last_name: The name of the column header for last names in the class lists
+    :return: Dictionary of section name to a data frame holding only the name columns of that section
+    """
+    return {section: read_table(roster, columns=[first_name, last_name]) for section, roster in rosters.items()}
+
+
+def name_sheets(rosters: dict, column_headers: list, first_name: str, last_name: str) -> dict:
+    """
+Make the sheet of each section with name columns followed by empty columns
+    :param rosters: Dictionary of section name to the class list of that section (see read_table)
+    :param column_headers: The headers of the empty columns
+    :param first_name: The name of the column header for first names in the class lists
+    :param last_name: The name of the column header for last names in the class lists
+    :return: Dictionary of section name to the sheet of that section
+    """
+    return name_sheet_frames(load_rosters(rosters, first_name=first_name, last_name=last_name), column_headers)
+
+
+def sign_in_sheets(rosters: dict, first_name: str, last_name: str) -> dict:
+    """
+Make the sign-in sheet of each section
+    :param rosters: Dictionary of section name to the class list of that section (see read_table)
+    :param first_name: The name of the column header for first names in the class lists
+    :param last_name: The name of the column header for last names in the class lists
+    :return: Dictionary of section name to the sign-in sheet of that section
+    """
+    return name_sheets(rosters, SIGN_IN_COLUMNS, first_name=first_name, last_name=last_name)
+
+
+def checkoff_columns(checkoff_table: pd.DataFrame, checkoff_header: str = None) -> list:
+    """
+Get the column headers of a checkoff sheet from the list of checkoffs
+    :param checkoff_table: The table of checkoff lists, with one list per column
+    :param checkoff_header: The name of the column header to use. The first column is used if not given.
+    :return: List of the checkoff points followed by the static grade and notes columns
+    """
+    if checkoff_header:
+        checkoff_list = list(checkoff_table[checkoff_header].dropna())
+    else:
+        checkoff_list = list(checkoff_table[checkoff_table.columns[0]].dropna())
+
+    # Add static grade and notes columns
+    checkoff_list.append('Grade')
+    checkoff_list.append('Notes')
+    return checkoff_list
+
+
+def checkoff_sheets(rosters: dict, checkoff_list, first_name: str, last_name: str, checkoff_header: str = None) -> dict:
+    """
+Make the checkoff sheet of each section for one lab
+    :param rosters: Dictionary of section name to the class list of that section (see read_table)
+    :param checkoff_list: The table of checkoff lists, with one list per column (see read_table)
+    :param first_name: The name of the column header for first names in the class lists
+    :param last_name: The name of the column header for last names in the class lists
+    :param checkoff_header: The column of the checkoff list to use. The first column is used if not given.
+    :return: Dictionary of section name to the checkoff sheet of that section
+    """
+    columns = checkoff_columns(read_table(checkoff_list), checkoff_header)
+    return name_sheets(rosters, columns, first_name=first_name, last_name=last_name)
+
+
+def add_fuzzy_matches(missing_by_section: dict, fuzzy_by_section: dict) -> dict:
+    """
+Add the students found by fuzzy matching after the exact matches of each section, printing each fuzzy match
+    :param missing_by_section: Dictionary of section name to a list of (last, first) names from collect_missing
+    :param fuzzy_by_section: Dictionary of section name to the fuzzy matches from FuzzyMatchCollector.results
+    :return: Dictionary of section name to a list of (last, first, match) rows, where match is None for exact matches
+    """
+    rows_by_section = {section: [(last, first, None) for last, first in names]
+                       for section, names in missing_by_section.items()}
+    for section, matches in fuzzy_by_section.items():
+        for last, first, class_last, class_first, score in matches:
+            print(f"\tFuzzy match in {section}: '{class_last}, {class_first}' is '{last}, {first}' ({score:.2f})")
+            rows_by_section.setdefault(section, []).append(
+                (last, first, f"Fuzzy: {class_last}, {class_first} ({score:.2f})"))
+    return rows_by_section
+
+
+def report_frames(section_names: list, missing_by_section: dict, fuzzy_matches: FuzzyMatchCollector = None) -> dict:
+    """
+Make the report sheet of each section with students missing an assignment
+    :param section_names: The names of the sections, in the order of the sheets
+    :param missing_by_section: Dictionary of section name to a list of (last, first) names from collect_missing
+    :param fuzzy_matches: The fuzzy matches of the class table, if fuzzy matching was used. The sheets then have a
+    column saying which students only matched this way.
+    :return: Dictionary of section name to its report, only for sections with missing assignments
+    """
+    columns = list(REPORT_COLUMNS)
+    if fuzzy_matches:
+        missing_by_section = add_fuzzy_matches(missing_by_section, fuzzy_matches.results())
+        columns.append(MATCH_COLUMN)
+    report = {}
+    for section in section_names:
+        if section in missing_by_section:
+            with stage('frame', rows=len(missing_by_section[section])):
+                report[section] = pd.DataFrame(missing_by_section[section], columns=columns)
+    return report
+
+
+def missing_assignments(rosters: dict,
+                        class_table,
+                        first_name: str,
+                        last_name: str,
+                        assignment_index: int = 7,
+                        fuzzy_threshold: float = None) -> dict:
+    """
+Find the students of each section who have not submitted an assignment
+    :param rosters: Dictionary of section name to the class list of that section (see read_table)
+    :param class_table: The grade center download of the assignment (see read_table)
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :param assignment_index: Column index where assignment grades/submissions are stored (column H/7 usually)
+    :param fuzzy_threshold: If given, students are also matched by similar names scoring at least this (from 0 to 1)
+    :return: Dictionary of section name to the students missing the assignment, only for sections with any missing
+    """
+    name_frames = load_rosters(rosters, first_name=first_name, last_name=last_name)
+    class_data = read_table(class_table)
+    assignment = class_data.columns[assignment_index]
+    missing = pd.isna(class_data[assignment])
+
+    name_index = build_name_index(name_frames, first_name=first_name, last_name=last_name)
+    missing_by_section = collect_missing(class_data, missing, name_index, first_name=first_name, last_name=last_name)
+    fuzzy_matches = None
+    if fuzzy_threshold is not None:
+        fuzzy_index = FuzzyNameIndex(name_frames, first_name=first_name, last_name=last_name,
+                                     threshold=fuzzy_threshold)
+        fuzzy_matches = FuzzyMatchCollector(fuzzy_index)
+        fuzzy_matches.add(class_data, missing, first_name=first_name, last_name=last_name)
+    return report_frames(list(name_frames), missing_by_section, fuzzy_matches)
+
+
+def to_xlsx(tables: dict, printable: bool = False) -> io.BytesIO:
+    """
+Write a workbook in memory with a sheet per section, formatted the same as the files written by the utility
+    :param tables: Dictionary of section name to data frame, e.g. from sign_in_sheets or missing_assignments
+    :param printable: Whether to lay out the sheets as the sign-in and checkoff sheets are, landscape and filling the
+    page to be printed
+    :return: The workbook, positioned at its start
+    """
+    buffer = io.BytesIO()
+    write_workbook(tables, buffer, max_last=printable, fill_page=printable, landscape=printable)
+    buffer.seek(0)
+    return buffer
+
+
+if __name__ == '__main__':
+    print("This file only contains the in-memory API for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
@@ -0,0 +1,91 @@
+"""Build manifest used to skip outputs whose inputs have not changed since they were written"""
+import json
+import os
+import pathlib
+
+from libs.roster_cache import file_fingerprint
+
+MANIFEST_NAME = '.ta_manifest.json'  # Written in the folder of the output files
+
+
+def _manifest_file(output_file: pathlib.Path) -> pathlib.Path:
+    """
+Get the manifest that records an output file
+    :param output_file: The output file
+    :return: Path of the manifest in the same folder as the output file
+    """
+    return output_file.parent / MANIFEST_NAME
+
+
+def _read_manifest(manifest_file: pathlib.Path) -> dict:
+    """
+Read a manifest file
+    :param manifest_file: The manifest to read
+    :return: Dictionary of output file to its build record, empty if there is no readable manifest
+    """
+    try:
+        with open(manifest_file) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def input_fingerprints(inputs: list) -> list:
+    """
+Fingerprint input files for build records. The modification time is left out so that downloading an identical file
+again does not cause a rebuild.
+    :param inputs: The input files
+    :return: List of the fingerprint of each file, in the same order
+    """
+    fingerprints = []
+    for file in inputs:
+        fingerprint = file_fingerprint(file)
+        del fingerprint['mtime']
+        fingerprints.append(fingerprint)
+    return fingerprints
+
+
+def build_record(inputs: list, options: dict, fingerprints: list = None) -> dict:
+    """
+Make the record of what an output file is built from
+    :param inputs: The input files of the output
+    :param options: The options used to build the output. Values must be JSON serializable.
+    :param fingerprints: Fingerprints from input_fingerprints of inputs shared by several outputs (e.g. the section
+    lists), so they are only hashed once per run. These come before the fingerprints of inputs in the record.
+    :return: Dictionary of the input fingerprints and options
+    """
+    return {'inputs': list(fingerprints or []) + input_fingerprints(inputs),
+            'options': json.loads(json.dumps(options, default=str))}
+
+
+def is_up_to_date(output_file: pathlib.Path, record: dict) -> bool:
+    """
+Check whether an output file exists and was last built from the same inputs and options
+    :param output_file: The output file
+    :param record: The build record of the output as it would be built now, from build_record
+    :return: True if the output does not need to be built again
+    """
+    if not output_file.exists():
+        return False
+    manifest = _read_manifest(_manifest_file(output_file))
+    return manifest.get(str(output_file.resolve())) == record
+
+
+def record_build(output_file: pathlib.Path, record: dict) -> None:
+    """
+Save the build record of an output file that was just written
+    :param output_file: The output file
+    :param record: The build record of the output, from build_record
+    """
+    manifest_file = _manifest_file(output_file)
+    manifest = _read_manifest(manifest_file)
+    manifest[str(output_file.resolve())] = record
+    temp_file = manifest_file.with_suffix('.tmp')
+    with open(temp_file, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_file, manifest_file)
+
+
+if __name__ == '__main__':
+    print("This file only contains the build manifest for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
@@ -1,10 +1,16 @@
 """Helper functions for ta_utility.py"""
+import importlib.util
 import pathlib
 import warnings
 import pandas as pd
 import math
 import os
 
+from libs.table_writer import write_output
+from libs.timings import stage
+from libs.xlsx_writer import MAX_PAGE_WIDTH, MAX_PAGE_HEIGHT, HEADER_HEIGHT, column_widths, workbook_formats
+from libs.zip_input import list_members, open_input, single_member
+
 
 def fix_column_width(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame, max_last=False) -> None:
     """
@@ -14,24 +20,15 @@ Change The width of all columns in an excel sheet to fit the text contained insi
     :param df: The data frame where sheet was written from
     :param max_last: Whether or not to maximize width of last column
     """
-    workbook = writer.book
     worksheet = writer.sheets[sheet_name]  # pull worksheet object
-    total_width = 0
-    max_width = 114.33
-    idx = 0
-    max_len = 0
-    cell_format = workbook.add_format({'border': 1})
-    for idx, col in enumerate(df):  # loop through all columns
-        series = df[col]
-        max_len = max((
-            series.astype(str).map(len).max(),  # len of largest item
-            len(str(series.name))  # len of column name/header
-        )) + 1  # adding a little extra space
-        worksheet.set_column(idx, idx, max_len, cell_format)  # set column width
-        total_width += max_len
-    if max_last:
+    cell_format = workbook_formats(writer.book)['border']
+    widths = column_widths(df)
+    for idx, width in enumerate(widths):  # loop through all columns
+        worksheet.set_column(idx, idx, width, cell_format)  # set column width
+    if max_last and widths:
         # set width to all fit on one page. 0.65 * idx is the error per column
-        worksheet.set_column(idx, idx, max_width - (total_width - max_len) - 0.65 * idx, cell_format)
+        idx = len(widths) - 1
+        worksheet.set_column(idx, idx, MAX_PAGE_WIDTH - (sum(widths) - widths[idx]) - 0.65 * idx, cell_format)
 
 
 def max_row_height(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame) -> None:
@@ -43,9 +40,10 @@ Make rows as tall as possible while remaining on a single page. Skips first row.
     :return:
     """
     worksheet = writer.sheets[sheet_name]
-    total_height = 537
     num_rows = df.shape[0]
-    row_height = math.floor((total_height - 15)/num_rows)
+    if not num_rows:
+        return
+    row_height = math.floor((MAX_PAGE_HEIGHT - HEADER_HEIGHT)/num_rows)
     for idx in range(1, num_rows + 1):
         worksheet.set_row(row=idx, height=row_height)
 
@@ -65,83 +63,352 @@ def get_sorted_csv_or_xls(folder_location: pathlib.Path,
                           check_xlsx: bool = False) -> list:
     """
 Get the CSV and XLS files in the folder and return sorted file list
-    :param folder_location: Location of folder to sort list of CSV and XLS files inside of
+    :param folder_location: Location of folder to sort list of CSV and XLS files inside of. This can also be a zip
+    archive, in which case the files are read straight from the archive.
     :param check_xlsx: Bool to check for XLSX as well
-    :return: Sorted list of files (by file name, not by type)
-    """
-    file_list = list(folder_location.glob("*.csv")) + list(folder_location.glob("*.xls"))
-    if check_xlsx:
-        file_list = file_list + list(folder_location.glob("*.xls"))
-    if not file_list:
-        raise RuntimeError("Expected files with extension '.csv' or '.xls' in location '{0}/'"
-                           .format(str(folder_location)))
-    file_list.sort()
+    :return: Sorted list of files (by file name, not by type). Files in a zip archive are zip_input.ZipMember.
+    """
+    with stage('discover') as counts:
+        suffixes = ('.csv', '.xls', '.xlsx') if check_xlsx else ('.csv', '.xls')
+        if folder_location.suffix == '.zip' and folder_location.is_file():
+            file_list = list_members(folder_location, suffixes)
+        else:
+            file_list = [file for suffix in suffixes for file in folder_location.glob("*" + suffix)]
+            file_list.sort()
+        if not file_list:
+            raise RuntimeError("Expected files with extension '{0}' in location '{1}/'"
+                               .format("' or '".join(suffixes), str(folder_location)))
+        counts['files'] = len(file_list)
     return file_list
 
 
-def read_csv_or_xls(file_location: pathlib.Path) -> pd.DataFrame:
+def _has_module(name: str) -> bool:
+    """
+Check whether an optional library is installed without importing it
+    :param name: The name of the library
+    :return: True if the library can be imported
+    """
+    return importlib.util.find_spec(name) is not None
+
+
+# Faster parsers are used when they are installed, falling back to the pandas defaults
+CSV_ENGINE = 'pyarrow' if _has_module('pyarrow') else None
+EXCEL_ENGINE = 'calamine' if _has_module('python_calamine') and \
+    tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2) else None
+ENGINE_MODULES = {'pyarrow': 'pyarrow.csv', 'calamine': 'python_calamine'}  # The library each parser imports
+
+# Parser to whether its library imported, so a broken install is only tried once per run
+_usable_engines = {}
+
+
+def _engine_usable(engine: str) -> bool:
+    """
+Check whether a parser's library can be imported. Being installed is not enough, e.g. pyarrow fails to import
+against an older numpy than it was built for. The library is only imported the first time a file needs it.
+    :param engine: The name of the parser, e.g. CSV_ENGINE
+    :return: True if the parser can be used
+    """
+    if engine not in _usable_engines:
+        try:
+            importlib.import_module(ENGINE_MODULES.get(engine, engine))
+            _usable_engines[engine] = True
+        except ImportError:
+            _usable_engines[engine] = False
+    return _usable_engines[engine]
+
+
+def _select_columns(available: list, columns: list) -> list:
+    """
+Get the positions of the wanted columns which are present in a file
+    :param available: The column headers of the file
+    :param columns: The column headers or column positions wanted
+    :return: Sorted list of the positions of the wanted columns. Headers that are not present are left out.
+    """
+    positions = set()
+    for column in columns:
+        if isinstance(column, int):
+            positions.add(column if column >= 0 else len(available) + column)
+        elif column in available:
+            positions.add(available.index(column))
+    return sorted(positions)
+
+
+def column_names(file_location: pathlib.Path) -> list:
+    """
+Get the column headers of a CSV or XLS file. Only the header row of a CSV file is parsed.
+    :param file_location: The path to the file to be read
+    :return: List of column headers
+    """
+    with open_input(file_location) as source:
+        if (file_location.suffix == '.xls') | (file_location.suffix == '.xlsx'):
+            return list(pd.read_excel(source, nrows=0).columns)
+        else:
+            return list(pd.read_csv(source, nrows=0).columns)
+
+
+def read_csv_or_xls(file_location: pathlib.Path, columns: list = None) -> pd.DataFrame:
     """
 Get CSV or XLS file and return contents as data frame.
+    :param file_location: The path to the file to be read. This can also be a file in a zip archive (from
+    get_sorted_csv_or_xls), or a zip archive holding a single CSV or XLS file.
+    :param columns: Column headers or column positions to read. Headers that are not in the file are ignored. All
+    columns are read if not given.
+    :return: Dataframe containing contents of the input file
+    """
+    if file_location.suffix == '.zip':
+        file_location = single_member(file_location, ('.csv', '.xls', '.xlsx'))
+    with stage('read', files=1) as counts:
+        data = _read_table(file_location, columns)
+        counts['rows'] = data.shape[0]
+    return data
+
+
+def read_csv_or_xls_chunks(file_location: pathlib.Path, chunksize: int, columns: list = None):
+    """
+Get CSV or XLS file as a sequence of data frames, so that large CSV files never have to be held in memory at once.
+XLS files can not be read in parts, so they are returned whole.
     :param file_location: The path to the file to be read
+    :param chunksize: Number of rows in each data frame
+    :param columns: Column headers or column positions to read. Headers that are not in the file are ignored. All
+    columns are read if not given.
+    :return: Iterator of data frames, in file order
+    """
+    if (file_location.suffix == '.xls') | (file_location.suffix == '.xlsx'):
+        yield read_csv_or_xls(file_location, columns=columns)
+        return
+    usecols = None
+    if columns is not None:
+        available = column_names(file_location)
+        usecols = [available[position] for position in _select_columns(available, columns)]
+    with open_input(file_location) as source, pd.read_csv(source, usecols=usecols, chunksize=chunksize) as reader:
+        files = 1  # Only the first part counts as reading the file
+        while True:
+            with stage('read', files=files) as counts:
+                try:
+                    chunk = next(reader)
+                except StopIteration:
+                    return
+                counts['rows'] = chunk.shape[0]
+            files = 0
+            yield chunk
+
+
+def _blank_to_missing(data: pd.DataFrame) -> pd.DataFrame:
+    """
+Make blank cells of text columns missing, as the default CSV parser does. Before pandas 2.0 the pyarrow parser reads
+them as empty strings, so an ungraded assignment in a column with any text (e.g. 'Needs Grading') would not be missing.
+    :param data: Data frame read with the pyarrow parser
+    :return: The data frame with empty strings replaced by NaN
+    """
+    text_columns = data.columns[(data.dtypes == object).to_numpy()]
+    if len(text_columns):
+        data[text_columns] = data[text_columns].replace('', float('nan'))
+    return data
+
+
+def _read_table(file_location: pathlib.Path, columns: list = None) -> pd.DataFrame:
+    """
+Read a CSV or XLS file for read_csv_or_xls, using the faster parsers when they are installed
+    :param file_location: The path to the file to be read
+    :param columns: Column headers or column positions to read, or None for all columns
     :return: Dataframe containing contents of the input file
     """
     if (file_location.suffix == '.xls') | (file_location.suffix == '.xlsx'):
-        return pd.read_excel(file_location)
+        # Excel readers parse every cell anyway, so the columns are selected once the sheet is read
+        data = None
+        if EXCEL_ENGINE and _engine_usable(EXCEL_ENGINE):
+            try:
+                with open_input(file_location) as source:
+                    data = pd.read_excel(source, engine=EXCEL_ENGINE)
+            except Exception:
+                data = None
+        if data is None:
+            with open_input(file_location) as source:
+                data = pd.read_excel(source)
+        if columns is not None:
+            data = data.iloc[:, _select_columns(list(data.columns), columns)]
+        return data
     else:
-        return pd.read_csv(file_location)
+        usecols = None
+        if columns is not None:
+            # Only parse the header row to find which columns are needed
+            available = column_names(file_location)
+            usecols = [available[position] for position in _select_columns(available, columns)]
+        # Each attempt opens the file again, as a file in a zip archive can only be read through once
+        if CSV_ENGINE and _engine_usable(CSV_ENGINE):
+            try:
+                with open_input(file_location) as source:
+                    data = pd.read_csv(source, usecols=usecols, engine=CSV_ENGINE)
+                return _blank_to_missing(data)
+            except (ValueError, NotImplementedError):  # Files or options the parser does not support (ArrowInvalid)
+                pass
+        with open_input(file_location) as source:
+            return pd.read_csv(source, usecols=usecols)
 
 
-def make_name_sheets(section_list_location: pathlib.Path,
-                     output_file: pathlib.Path,
-                     column_headers: list,
+def name_key(first, last):
+    """
+Build the (last, first) key used to match students between files. Missing names never match anything.
+    :param first: First name of the student
+    :param last: Last name of the student
+    :return: Tuple of (last, first) or None if either name is missing
+    """
+    if pd.isna(first) or pd.isna(last):
+        return None
+    return last, first
+
+
+def build_name_index(rosters: dict, first_name: str, last_name: str) -> dict:
+    """
+Index every student in the rosters by name so that lookups do not have to scan each section.
+    :param rosters: Dictionary of section name to the data frame of students in that section
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :return: Dictionary of (last, first) key to a list of section names, with one entry per matching row
+    """
+    index = {}
+    with stage('index names') as counts:
+        for section, section_data in rosters.items():
+            for first, last in zip(section_data[first_name], section_data[last_name]):
+                key = name_key(first, last)
+                if key is not None:
+                    index.setdefault(key, []).append(section)
+            counts['rows'] += section_data.shape[0]
+    return index
+
+
+def collect_missing(class_data: pd.DataFrame,
+                    missing: pd.Series,
+                    name_index: dict,
+                    first_name: str,
+                    last_name: str,
+                    missing_by_section: dict = None) -> dict:
+    """
+Find the students of each section that are missing an assignment in the class data.
+    :param class_data: The data frame of the class (grade center) file
+    :param missing: Boolean series, aligned with class_data, which is true where the assignment is missing
+    :param name_index: Index of the section rosters made by build_name_index
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :param missing_by_section: Dictionary to add the results to (a new dictionary is made if not given)
+    :return: Dictionary of section name to a list of (last, first) names missing the assignment in class order
+    """
+    if missing_by_section is None:
+        missing_by_section = {}
+    with stage('match', rows=class_data.shape[0]):
+        missing = missing.to_numpy(dtype=bool)
+        for first, last in zip(class_data[first_name].to_numpy()[missing],
+                               class_data[last_name].to_numpy()[missing]):
+            for section in name_index.get(name_key(first, last), ()):
+                missing_by_section.setdefault(section, []).append((last, first))
+    return missing_by_section
+
+
+def load_name_frames(section_list_location: pathlib.Path,
                      first_name: str,
-                     last_name: str
-                     ) -> int:
+                     last_name: str,
+                     use_cache: bool = True,
+                     roster_db: pathlib.Path = None
+                     ) -> dict:
     """
-Make an Excel file with a single sheet for each section in the list with name columns as well as the input columns
+Read the name columns of every section list, so they can be reused for several sets of sheets
     :param section_list_location: The location of the files containing section information
-    :param output_file: The path to the output file
-    :param column_headers: The headers of the columns to include on the sheet
     :param first_name: The name of the column header for first names in the files
     :param last_name: The name of the column header for last names in the files
-    :return: 0 for success, otherwise an error.
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param roster_db: If given, the rosters are read from this database instead of the section lists
+    :return: Dictionary of section name to a data frame holding only the name columns of that section
     """
-    section_list = get_sorted_csv_or_xls(section_list_location)
+    # Imported here as the roster cache and database read files using this module
+    from libs.roster_cache import read_roster
+    from libs.roster_db import load_rosters
+
+    if roster_db:
+        return load_rosters(roster_db, first_name=first_name, last_name=last_name)
+
+    # only the columns needed for names are read
+    return {file.stem: read_roster(file, columns=[first_name, last_name], use_disk_cache=use_cache)
+            for file in get_sorted_csv_or_xls(section_list_location)}
+
+
+def name_sheet_frames(name_frames: dict, column_headers: list) -> dict:
+    """
+Add empty columns to the names of each section, to be filled in on paper
+    :param name_frames: The name columns of each section, as given by load_name_frames
+    :param column_headers: The headers of the columns to add
+    :return: Dictionary of section name to the names followed by the empty columns
+    """
+    sheets = {}
+    for sheet_name, name_data in name_frames.items():
+        with stage('frame', rows=name_data.shape[0]):
+            section_data = name_data.copy()
+            empty_column = [None] * section_data.shape[0]
+
+            # add custom columns
+            for header in column_headers:
+                section_data[header] = empty_column
+        sheets[sheet_name] = section_data
+    return sheets
 
+
+def write_name_sheets(name_frames: dict,
+                      output_file: pathlib.Path,
+                      column_headers: list,
+                      output_format: str = 'xlsx'
+                      ) -> int:
+    """
+Write an Excel file with a single sheet for each section with name columns as well as the input columns
+    :param name_frames: The name columns of each section, as given by load_name_frames
+    :param output_file: The path to the output file
+    :param column_headers: The headers of the columns to include on the sheet
+    :param output_format: One of table_writer.OUTPUT_FORMATS. Formats other than 'xlsx' are written without any
+    formatting, to the path given by table_writer.output_path.
+    :return: 0 for success, otherwise an error.
+    """
     # Check for incorrect output file extension
-    if output_file.suffix != '.xlsx':
+    if output_format == 'xlsx' and output_file.suffix != '.xlsx':
         warnings.warn(
             f"The output extension should be '.xlsx', instead of '{output_file.suffix}'. This may cause an error.")
 
     # Check if output folder exists and prompt user to create the folder if it does not
     if not os.path.exists(output_file.parent):
         print(f"The specified output folder '{output_file.parent}/' does not exist. It has been created")
-        os.makedirs(output_file.parent)
+        os.makedirs(output_file.parent, exist_ok=True)
 
     # Write all first and last names to a sheet per section (sections are defined by individual input files)
-    writer = pd.ExcelWriter(output_file)
-    for file in section_list:
-        if file.suffix == '.xls':
-            section_data = pd.read_excel(file)
-        else:
-            section_data = pd.read_csv(file)
-        # determine which columns are needed for name and remove the remainder
-        columns_keep = (section_data.columns == last_name) | (section_data.columns == first_name)
-        section_data.drop(columns=section_data.columns[~columns_keep], inplace=True)
-        empty_column = [None] * section_data.shape[0]
-
-        # add custom columns and write them out
-        for header in column_headers:
-            section_data[header] = empty_column
-        section_data.to_excel(writer, sheet_name=file.stem, index=False)
-        fix_column_width(writer=writer, sheet_name=file.stem, df=section_data, max_last=True)
-        max_row_height(writer=writer, sheet_name=file.stem, df=section_data)
-        set_landscape(writer=writer, sheet_name=file.stem)
-    writer.save()
+    write_output(name_sheet_frames(name_frames, column_headers), output_file, output_format,
+                 max_last=True, fill_page=True, landscape=True)
 
     return 0
 
 
+def make_name_sheets(section_list_location: pathlib.Path,
+                     output_file: pathlib.Path,
+                     column_headers: list,
+                     first_name: str,
+                     last_name: str,
+                     use_cache: bool = True,
+                     output_format: str = 'xlsx',
+                     roster_db: pathlib.Path = None
+                     ) -> int:
+    """
+Make an Excel file with a single sheet for each section in the list with name columns as well as the input columns
+    :param section_list_location: The location of the files containing section information
+    :param output_file: The path to the output file
+    :param column_headers: The headers of the columns to include on the sheet
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param output_format: One of table_writer.OUTPUT_FORMATS
+    :param roster_db: If given, the rosters are read from this database instead of the section lists
+    :return: 0 for success, otherwise an error.
+    """
+    name_frames = load_name_frames(section_list_location, first_name=first_name, last_name=last_name,
+                                   use_cache=use_cache, roster_db=roster_db)
+    return write_name_sheets(name_frames, output_file=output_file, column_headers=column_headers,
+                             output_format=output_format)
+
+
 if __name__ == '__main__':
     print("This file only contains helper functions for the 3201 utility. Run '3201_utility' to use this utility!")
     exit(0)
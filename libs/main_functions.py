@@ -1,18 +1,69 @@
 """The main functions for the utility"""
 # Built-in libraries
+import contextlib
+import io
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
 
 # External libraries
 import pandas as pd
 
 # Internal helper functions
-from libs.helper_functions import fix_column_width, get_sorted_csv_or_xls, read_csv_or_xls, make_name_sheets
+from libs.api import SIGN_IN_COLUMNS, checkoff_columns, report_frames
+from libs.helper_functions import get_sorted_csv_or_xls, read_csv_or_xls, read_csv_or_xls_chunks, column_names, \
+    make_name_sheets, load_name_frames, write_name_sheets, build_name_index, collect_missing
+from libs.build_manifest import build_record, input_fingerprints, is_up_to_date, record_build
+from libs.name_matching import FuzzyNameIndex, FuzzyMatchCollector
+from libs.missing_matrix import build_missing_matrix, write_missing_matrix, save_missing_matrix
+from libs.roster_cache import read_rosters
+from libs.roster_db import load_rosters, roster_version
+from libs.table_writer import output_path, write_output
+from libs import timings
+
+MATRIX_REPORT_FILE = 'Missing_Assignments.xlsx'  # Report of every assignment written by check_pre_labs_matrix
+MATRIX_FILE = 'missing_matrix.pkl'  # The matrix saved by check_pre_labs_matrix for later commands
+
+
+def section_inputs(section_list_location: pathlib.Path, roster_db: pathlib.Path = None) -> tuple:
+    """
+Get what the section rosters of an output are read from, for its build record
+    :param section_list_location: Folder containing class sections
+    :param roster_db: The roster database, if the rosters are read from it instead of the section lists
+    :return: Tuple of the list of section files (empty when the database is used) and a dictionary of options to add
+    to the build record
+    """
+    if roster_db:
+        return [], {'roster_db': roster_version(roster_db)}
+    return get_sorted_csv_or_xls(section_list_location), {}
+
+
+def section_rosters(section_list: list,
+                    first_name: str,
+                    last_name: str,
+                    use_cache: bool = True,
+                    roster_db: pathlib.Path = None) -> dict:
+    """
+Read the name columns of every section, from the section lists or from the roster database
+    :param section_list: The section files, from section_inputs
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param roster_db: The roster database, if the rosters are read from it instead of the section lists
+    :return: Dictionary of section name to a data frame of the name columns of that section
+    """
+    if roster_db:
+        return load_rosters(roster_db, first_name=first_name, last_name=last_name)
+    return read_rosters(section_list, columns=[first_name, last_name], use_disk_cache=use_cache)
 
 
 def create_sign_in_sheets(section_list_location: pathlib.Path,
                           sign_in_file: pathlib.Path,
                           first_name: str,
-                          last_name: str
+                          last_name: str,
+                          use_cache: bool = True,
+                          force: bool = False,
+                          output_format: str = 'xlsx',
+                          roster_db: pathlib.Path = None
                           ) -> int:
     """
 Import students names from section and create sign-in sheet
@@ -20,49 +71,289 @@ Import students names from section and create sign-in sheet
     :param sign_in_file: File to output all sign-in sheets to (XLSX format)
     :param first_name: The first name column header
     :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param force: Write the output even if its inputs have not changed since it was last written
+    :param output_format: One of table_writer.OUTPUT_FORMATS. The extension of sign_in_file is changed to match.
+    :param roster_db: If given, the rosters are read from this database (see import-rosters) instead of the section
+    lists
     :return: 0 for success and other for failure
     """
-    return make_name_sheets(section_list_location=section_list_location,
-                            output_file=sign_in_file,
-                            column_headers=['Time In', 'Time Out', 'Complete?', 'Signature'],
-                            first_name=first_name,
-                            last_name=last_name,
-                            )
+    column_headers = SIGN_IN_COLUMNS
+    sign_in_file = output_path(sign_in_file, output_format)
+    section_list, roster_options = section_inputs(section_list_location, roster_db)
+    record = build_record(section_list, {'command': 'sign-in', 'columns': column_headers,
+                                         'first_name': first_name, 'last_name': last_name, **roster_options})
+    if not force and is_up_to_date(sign_in_file, record):
+        print(f"{sign_in_file} is up to date")
+        return 0
+
+    result = make_name_sheets(section_list_location=section_list_location,
+                              output_file=sign_in_file,
+                              column_headers=column_headers,
+                              first_name=first_name,
+                              last_name=last_name,
+                              use_cache=use_cache,
+                              output_format=output_format,
+                              roster_db=roster_db)
+    if result == 0:
+        record_build(sign_in_file, record)
+    return result
+
+
+def checkoff_output_file(checkoff_file: pathlib.Path, checkoff_header: str) -> pathlib.Path:
+    """
+Get the file name used for one lab when making checkoffs for several labs at once
+    :param checkoff_file: The output file given for all of the checkoffs
+    :param checkoff_header: The checkoff list header of the lab
+    :return: The output file with the header added to the name (e.g. checkoffs_Lab_5.xlsx)
+    """
+    lab_name = '_'.join(str(checkoff_header).split())
+    return checkoff_file.with_name(f"{checkoff_file.stem}_{lab_name}{checkoff_file.suffix}")
+
+
+def _init_checkoff_worker(record_timings: bool = False) -> None:
+    """
+Set up a worker process which writes checkoff sheets
+    :param record_timings: Whether to record the stages run in the worker
+    """
+    if record_timings:
+        timings.enable()
+        timings.collect()  # Forget stages copied from the main process when the worker was forked
+
+
+def _write_name_sheets_in_worker(name_frames: dict,
+                                 output_file: pathlib.Path,
+                                 column_headers: list,
+                                 output_format: str = 'xlsx') -> tuple:
+    """
+Write the checkoff sheets of one lab in a worker process
+    :param name_frames: Dictionary of section name to the name columns of that section, from load_name_frames
+    :param output_file: File to output the sheets to
+    :param column_headers: The headers of the empty columns after the names
+    :param output_format: One of table_writer.OUTPUT_FORMATS
+    :return: Tuple of the result of write_name_sheets and the stages recorded while writing
+    """
+    return write_name_sheets(name_frames, output_file=output_file, column_headers=column_headers,
+                             output_format=output_format), timings.collect()
 
 
 def make_checkoffs(section_list_location: pathlib.Path,
                    checkoff_file: pathlib.Path,
                    checkoff_list_file: pathlib.Path,
-                   checkoff_header: str,
+                   checkoff_header,
                    first_name: str,
-                   last_name: str
+                   last_name: str,
+                   use_cache: bool = True,
+                   all_headers: bool = False,
+                   jobs: int = 1,
+                   force: bool = False,
+                   output_format: str = 'xlsx',
+                   roster_db: pathlib.Path = None
                    ) -> int:
     """
 Import students names from section and create checkoff sheet
     :param section_list_location: Folder containing class sections
     :param checkoff_file: File to output all check off sheets to (XLSX format)
     :param checkoff_list_file: A csv or xls or xlsx file that contains a list of checkoff points to use
-    :param checkoff_header: The name of the column header to use if more than one list is in the file
+    :param checkoff_header: The name of the column header to use if more than one list is in the file. A list of
+    headers makes one file per header, named after the header.
     :param first_name: The first name column header
     :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param all_headers: Make one file for every column header in the list file
+    :param jobs: Number of processes used to write the files when making more than one
+    :param force: Write the outputs even if their inputs have not changed since they were last written
+    :param output_format: One of table_writer.OUTPUT_FORMATS. The extension of checkoff_file is changed to match.
+    :param roster_db: If given, the rosters are read from this database (see import-rosters) instead of the section
+    lists
     :return: 0 for success and other for failure
     """
 
     # Get list of checkoffs to have a column for
     checkoff_table = read_csv_or_xls(checkoff_list_file)
-    if checkoff_header:
-        checkoff_list = list(checkoff_table[checkoff_header].dropna())
+    if all_headers:
+        headers = list(checkoff_table.columns)
+    elif isinstance(checkoff_header, (list, tuple)):
+        headers = list(checkoff_header)
+    else:
+        headers = None
+
+    if headers is None:
+        output_files = [checkoff_file]
+        column_headers = [checkoff_columns(checkoff_table, checkoff_header)]
+    else:
+        if len(headers) == 1:
+            output_files = [checkoff_file]
+        else:
+            output_files = [checkoff_output_file(checkoff_file, header) for header in headers]
+        column_headers = [checkoff_columns(checkoff_table, header) for header in headers]
+    output_files = [output_path(output_file, output_format) for output_file in output_files]
+
+    # Leave out the files which were already written from the same inputs
+    # The section lists are hashed once and shared by the record of every lab
+    section_list, roster_options = section_inputs(section_list_location, roster_db)
+    section_fingerprints = input_fingerprints(section_list)
+    records = [build_record([checkoff_list_file],
+                            {'command': 'make-checkoffs', 'columns': columns,
+                             'first_name': first_name, 'last_name': last_name, **roster_options},
+                            fingerprints=section_fingerprints)
+               for columns in column_headers]
+    builds = []
+    for output_file, columns, record in zip(output_files, column_headers, records):
+        if not force and is_up_to_date(output_file, record):
+            print(f"{output_file} is up to date")
+        else:
+            builds.append((output_file, columns, record))
+    if not builds:
+        return 0
+
+    # The name columns of each section are read once and shared by every lab
+    name_frames = load_name_frames(section_list_location, first_name=first_name, last_name=last_name,
+                                   use_cache=use_cache, roster_db=roster_db)
+    if jobs > 1 and len(builds) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(builds)),
+                                 initializer=_init_checkoff_worker,
+                                 initargs=(timings.is_enabled(),)) as executor:
+            results = []
+            for result, worker_timings in executor.map(_write_name_sheets_in_worker, [name_frames] * len(builds),
+                                                       [output_file for output_file, _, _ in builds],
+                                                       [columns for _, columns, _ in builds],
+                                                       [output_format] * len(builds)):
+                timings.merge(worker_timings)
+                results.append(result)
+    else:
+        results = [write_name_sheets(name_frames, output_file=output_file, column_headers=columns,
+                                     output_format=output_format)
+                   for output_file, columns, _ in builds]
+    for (output_file, _, record), result in zip(builds, results):
+        if result == 0:
+            record_build(output_file, record)
+            if len(output_files) > 1:
+                print(f"Wrote {output_file}")
+    return max(results)
+
+
+def report_file(class_file: pathlib.Path,
+                output_location: pathlib.Path,
+                file_suffix: str,
+                output_format: str = 'xlsx') -> pathlib.Path:
+    """
+Get the report file written for a class file
+    :param class_file: The assignment file from grade center
+    :param output_location: Location to save output file
+    :param file_suffix: Output file suffix to be added to input
+    :param output_format: One of table_writer.OUTPUT_FORMATS
+    :return: Path of the report, a .xlsx file unless another format is given
+    """
+    return output_path(output_location/pathlib.Path(str(class_file.stem) + file_suffix + ".xlsx"), output_format)
+
+
+def check_pre_lab_file(class_file: pathlib.Path,
+                       section_names: list,
+                       name_index: dict,
+                       file_suffix: str,
+                       output_location: pathlib.Path,
+                       assignment_index: int,
+                       first_name: str,
+                       last_name: str,
+                       chunksize: int = None,
+                       fuzzy_index: FuzzyNameIndex = None,
+                       output_format: str = 'xlsx'
+                       ) -> None:
+    """
+Write the report of students missing the assignment in a single class file
+    :param class_file: The assignment file from grade center
+    :param section_names: The names of the sections, in the order to write their sheets
+    :param name_index: Index of the section rosters made by build_name_index
+    :param file_suffix: Output file suffix to be added to input. Output file is always .xlsx file.
+    :param output_location: Location to save output file
+    :param assignment_index: Column index where assignment grades/submissions are stored
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param chunksize: If given, CSV files are read this many rows at a time to limit memory use
+    :param fuzzy_index: If given, students without an exact match are also matched to Grade Center rows with similar
+    names, and the reports get a column saying which names only matched this way
+    :param output_format: One of table_writer.OUTPUT_FORMATS
+    """
+    print(f"\nNow checking {str(class_file.name)} for missing submissions")
+    # Only read the name columns and the assignment column
+    assignment = column_names(class_file)[assignment_index]
+    fuzzy_matches = FuzzyMatchCollector(fuzzy_index) if fuzzy_index else None
+    if chunksize:
+        # Only the students missing the assignment are kept as each part of the file is read
+        missing_by_section = {}
+        for class_data in read_csv_or_xls_chunks(class_file, chunksize, columns=[first_name, last_name, assignment]):
+            collect_missing(class_data, pd.isna(class_data[assignment]), name_index,
+                            first_name=first_name, last_name=last_name, missing_by_section=missing_by_section)
+            if fuzzy_matches:
+                fuzzy_matches.add(class_data, pd.isna(class_data[assignment]), first_name=first_name,
+                                  last_name=last_name)
     else:
-        checkoff_list = list(checkoff_table[checkoff_table.columns[0]].dropna())
+        class_data = read_csv_or_xls(class_file, columns=[first_name, last_name, assignment])
+        # Determine which students in class have not submitted
+        prelab_bool = pd.isna(class_data[assignment])
+        missing_by_section = collect_missing(class_data, prelab_bool, name_index,
+                                             first_name=first_name, last_name=last_name)
+        if fuzzy_matches:
+            fuzzy_matches.add(class_data, prelab_bool, first_name=first_name, last_name=last_name)
+    # Write a sheet for each section with missing assignments
+    report = report_frames(section_names, missing_by_section, fuzzy_matches)
+    for sheet_name in section_names:
+        if sheet_name not in report:
+            print(f"\tNo missing assignments in {sheet_name}")
+    # Add suffix to file name to save report
+    write_output(report, report_file(class_file, output_location, file_suffix, output_format), output_format)
+
+
+# Section rosters shared with the worker processes of check_pre_labs
+_worker_rosters = {}
 
-    # Add static grade and notes columns
-    checkoff_list.append('Grade')
-    checkoff_list.append('Notes')
-    return make_name_sheets(section_list_location=section_list_location,
-                            output_file=checkoff_file,
-                            column_headers=checkoff_list,
-                            first_name=first_name,
-                            last_name=last_name)
+
+def _init_pre_lab_worker(section_names: list,
+                         name_index: dict,
+                         record_timings: bool = False,
+                         fuzzy_index: FuzzyNameIndex = None) -> None:
+    """
+Store the section rosters in a worker process so they are only sent once per process
+    :param section_names: The names of the sections, in the order to write their sheets
+    :param name_index: Index of the section rosters made by build_name_index
+    :param record_timings: Whether to record the stages run in the worker
+    :param fuzzy_index: Index of the section rosters for fuzzy matching, None to only match exactly
+    """
+    _worker_rosters['section_names'] = section_names
+    _worker_rosters['name_index'] = name_index
+    _worker_rosters['fuzzy_index'] = fuzzy_index
+    if record_timings:
+        timings.enable()
+        timings.collect()  # Forget stages copied from the main process when the worker was forked
+
+
+def _run_pre_lab_check(class_file: pathlib.Path, settings: dict) -> tuple:
+    """
+Check a single class file, collecting its console output and catching any failure
+    :param class_file: The assignment file from grade center
+    :param settings: The remaining keyword arguments for check_pre_lab_file
+    :return: Tuple of whether the check succeeded and the console output of the check
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            check_pre_lab_file(class_file, **_worker_rosters, **settings)
+            succeeded = True
+        except Exception as error:
+            print(f"\tFailed to check {str(class_file.name)}: {error!r}")
+            succeeded = False
+    return succeeded, log.getvalue()
+
+
+def _run_pre_lab_check_in_worker(class_file: pathlib.Path, settings: dict) -> tuple:
+    """
+Check a single class file in a worker process
+    :param class_file: The assignment file from grade center
+    :param settings: The remaining keyword arguments for check_pre_lab_file
+    :return: Tuple of whether the check succeeded, the console output and the stages recorded by the check
+    """
+    return (*_run_pre_lab_check(class_file, settings), timings.collect())
 
 
 def check_pre_labs(section_list_location: pathlib.Path,
@@ -71,7 +362,14 @@ def check_pre_labs(section_list_location: pathlib.Path,
                    output_location: pathlib.Path,
                    assignment_index: int,
                    first_name: str,
-                   last_name: str
+                   last_name: str,
+                   use_cache: bool = True,
+                   jobs: int = 1,
+                   force: bool = False,
+                   chunksize: int = None,
+                   fuzzy_threshold: float = None,
+                   output_format: str = 'xlsx',
+                   roster_db: pathlib.Path = None
                    ) -> int:
     """
 Write a report to determine which students have not completed an assignment. This function is designed to check pre-labs
@@ -82,56 +380,182 @@ Write a report to determine which students have not completed an assignment. Thi
     :param output_location: Location to save output file(s)
     :param first_name: The first name column header
     :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param jobs: Number of processes used to check the class files
+    :param force: Check every class file even if its report is newer than its inputs
+    :param chunksize: If given, CSV class files are read this many rows at a time so memory use depends on the size of
+    the rosters rather than the size of the class files
+    :param fuzzy_threshold: If given, students are also matched by similar names scoring at least this (from 0 to 1),
+    e.g. for differences in case, accents, hyphens or preferred first names
+    :param output_format: One of table_writer.OUTPUT_FORMATS
+    :param roster_db: If given, the rosters are read from this database (see import-rosters) instead of the section
+    lists
     :return: 0 for success and other for failure
     """
     # Get the list of section files and class files
     # The section files contain students in each section
     # The class files are the assignment files from grade center
-    section_list = get_sorted_csv_or_xls(section_list_location)
+    section_list, roster_options = section_inputs(section_list_location, roster_db)
     lab_list = get_sorted_csv_or_xls(prelab_location)
 
-    # iterate through each class file
+    # Leave out the class files whose reports were already written from the same inputs
+    section_fingerprints = input_fingerprints(section_list)
+    records = {}
     for class_file in lab_list:
-        print(f"\nNow checking {str(class_file.name)} for missing submissions")
-        class_data = read_csv_or_xls(class_file)
-        # Determine which students in class have not submitted
-        prelab_bool = pd.isna(class_data[class_data.columns[assignment_index]])
-        # Add suffix to file name to save report
-        file_name = output_location/pathlib.Path(str(class_file.stem) + file_suffix + ".xlsx")
-        writer = pd.ExcelWriter(file_name)  # Open excel writer to write out report to
-        # check each section list against the lab list to see if student names match
-        for section_file in section_list:
-            section_data = read_csv_or_xls(section_file)
-            # there is probably a better way to do this :(
-            # Initialize lists
-            last_list = []
-            first_list = []
-            missing_list = []
-            # Iterate through each student in each the lab and class sections to compare names and if assignment
-            # submitted
-            for index_class in range(class_data.shape[0]):
-                for index_section in range(section_data.shape[0]):
-                    # Get the first and last name of the current student for both the class and section
-                    lab_first = class_data[first_name][index_class]
-                    lab_last = class_data[last_name][index_class]
-                    section_first = section_data[first_name][index_section]
-                    section_last = section_data[last_name][index_section]
-                    # Check for matching name and missing prelab
-                    if (section_first == lab_first) & (section_last == lab_last) & prelab_bool[index_class]:
-                        # add name to list if matches and prelab is missing
-                        last_list.append(lab_last)
-                        first_list.append(lab_first)
-                        missing_list.append(prelab_bool[index_class])
-            # Write new sheet if any missing assignments
-            if last_list:
-                sheet_name = section_file.stem
-                output_data = pd.DataFrame(list(zip(last_list, first_list)),
-                                           columns=['Last Name', 'First Name'])
-                output_data.to_excel(writer, sheet_name=sheet_name, index=False)
-                fix_column_width(writer=writer, sheet_name=sheet_name, df=output_data)
-            else:
-                print(f"\tNo missing assignments in {str(section_file.stem)}")
-        writer.save()
+        record = pre_lab_record(section_fingerprints, class_file, assignment_index,
+                                first_name=first_name, last_name=last_name,
+                                fuzzy_threshold=fuzzy_threshold, roster_options=roster_options)
+        if not force and is_up_to_date(report_file(class_file, output_location, file_suffix, output_format), record):
+            print(f"\n{str(class_file.name)} is unchanged since its report was written")
+        else:
+            records[class_file] = record
+    if not records:
+        return 0
+
+    # Read each section once and index students by name so that matching is linear in the class size
+    rosters = section_rosters(section_list, first_name=first_name, last_name=last_name, use_cache=use_cache,
+                              roster_db=roster_db)
+    name_index = build_name_index(rosters, first_name=first_name, last_name=last_name)
+    fuzzy_index = None
+    if fuzzy_threshold is not None:
+        fuzzy_index = FuzzyNameIndex(rosters, first_name=first_name, last_name=last_name, threshold=fuzzy_threshold)
+    settings = {'file_suffix': file_suffix,
+                'output_location': output_location,
+                'assignment_index': assignment_index,
+                'first_name': first_name,
+                'last_name': last_name,
+                'chunksize': chunksize,
+                'output_format': output_format}
+    failures = check_class_files(records, list(rosters), name_index, settings, jobs=jobs, fuzzy_index=fuzzy_index)
+
+    if failures:
+        print(f"\n{failures} of {len(lab_list)} files could not be checked")
+        return 1
+    return 0
+
+
+def pre_lab_record(section_fingerprints: list,
+                   class_file: pathlib.Path,
+                   assignment_index: int,
+                   first_name: str,
+                   last_name: str,
+                   fuzzy_threshold: float = None,
+                   roster_options: dict = None) -> dict:
+    """
+Make the build record of the report of a class file
+    :param section_fingerprints: The fingerprints of the section files, from build_manifest.input_fingerprints
+    :param class_file: The assignment file from grade center
+    :param assignment_index: Column index where assignment grades/submissions are stored
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param fuzzy_threshold: The fuzzy matching threshold, None if only exact matches are used
+    :param roster_options: Options describing the rosters, from section_inputs
+    :return: The build record, from build_record
+    """
+    options = {'command': 'check-pre-labs', 'assignment_index': assignment_index,
+               'first_name': first_name, 'last_name': last_name, **(roster_options or {})}
+    if fuzzy_threshold is not None:
+        options['fuzzy_threshold'] = fuzzy_threshold
+    return build_record([class_file], options, fingerprints=section_fingerprints)
+
+
+def check_class_files(records: dict,
+                      section_names: list,
+                      name_index: dict,
+                      settings: dict,
+                      jobs: int = 1,
+                      fuzzy_index: FuzzyNameIndex = None) -> int:
+    """
+Write the report of each class file, printing the output of each file in order once it is done
+    :param records: Dictionary of each class file to check to the build record of its report
+    :param section_names: The names of the sections, in the order to write their sheets
+    :param name_index: Index of the section rosters made by build_name_index
+    :param settings: The remaining keyword arguments for check_pre_lab_file
+    :param jobs: Number of processes used to check the class files
+    :param fuzzy_index: Index of the section rosters for fuzzy matching, None to only match exactly
+    :return: The number of class files which could not be checked
+    """
+    lab_list = list(records)
+    output_files = {class_file: report_file(class_file, settings['output_location'], settings['file_suffix'],
+                                            settings.get('output_format', 'xlsx'))
+                    for class_file in lab_list}
+    failures = 0
+    if jobs > 1 and len(lab_list) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(lab_list)),
+                                 initializer=_init_pre_lab_worker,
+                                 initargs=(section_names, name_index, timings.is_enabled(), fuzzy_index)) as executor:
+            results = executor.map(_run_pre_lab_check_in_worker, lab_list, [settings] * len(lab_list))
+            for class_file, (succeeded, log, worker_timings) in zip(lab_list, results):
+                print(log, end='')
+                timings.merge(worker_timings)
+                if succeeded:
+                    record_build(output_files[class_file], records[class_file])
+                failures += not succeeded
+    else:
+        _init_pre_lab_worker(section_names, name_index, fuzzy_index=fuzzy_index)
+        for class_file in lab_list:
+            succeeded, log = _run_pre_lab_check(class_file, settings)
+            print(log, end='')
+            if succeeded:
+                record_build(output_files[class_file], records[class_file])
+            failures += not succeeded
+    return failures
+
+
+def check_pre_labs_matrix(section_list_location: pathlib.Path,
+                          prelab_location: pathlib.Path,
+                          output_location: pathlib.Path,
+                          assignment_index: int,
+                          first_name: str,
+                          last_name: str,
+                          use_cache: bool = True,
+                          force: bool = False,
+                          roster_db: pathlib.Path = None
+                          ) -> int:
+    """
+Write a single report of which students are missing which assignments, with a sheet per section. The student by
+assignment matrix is also saved (as MATRIX_FILE in the output location) for later commands.
+    :param section_list_location: Folder where lab section lists are stored
+    :param prelab_location: Location where the pre-lab assignment files are located
+    :param output_location: Location to save output file(s)
+    :param assignment_index: Column index where assignment grades/submissions are stored (column H/7 usually)
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param force: Write the report even if its inputs have not changed since it was last written
+    :param roster_db: If given, the rosters are read from this database (see import-rosters) instead of the section
+    lists
+    :return: 0 for success and other for failure
+    """
+    section_list, roster_options = section_inputs(section_list_location, roster_db)
+    lab_list = get_sorted_csv_or_xls(prelab_location)
+    output_file = output_location / MATRIX_REPORT_FILE
+    matrix_file = output_location / MATRIX_FILE
+    record = build_record(section_list + lab_list, {'command': 'check-pre-labs --matrix',
+                                                    'assignment_index': assignment_index,
+                                                    'first_name': first_name, 'last_name': last_name,
+                                                    **roster_options})
+    # The saved matrix is an output as well, so it is written again if it was deleted
+    if not force and is_up_to_date(output_file, record) and is_up_to_date(matrix_file, record):
+        print(f"{output_file} is up to date")
+        return 0
+
+    # Read every section and every class file once
+    rosters = section_rosters(section_list, first_name=first_name, last_name=last_name, use_cache=use_cache,
+                              roster_db=roster_db)
+    class_tables = {}
+    for class_file in lab_list:
+        assignment = column_names(class_file)[assignment_index]
+        class_tables[class_file.stem] = (read_csv_or_xls(class_file, columns=[first_name, last_name, assignment]),
+                                         assignment)
+
+    print(f"\nChecking {len(lab_list)} files for missing submissions")
+    matrix = build_missing_matrix(rosters, class_tables, first_name=first_name, last_name=last_name)
+    output_location.mkdir(parents=True, exist_ok=True)
+    write_missing_matrix(matrix, output_file)
+    save_missing_matrix(matrix, matrix_file)
+    record_build(output_file, record)
+    record_build(matrix_file, record)
     return 0
 
 
@@ -0,0 +1,111 @@
+"""Student by assignment matrix of missing work across every Grade Center export"""
+import pathlib
+import pandas as pd
+
+from libs.timings import stage
+from libs.xlsx_writer import open_workbook, write_sheet
+
+SECTION_COLUMN = 'Section'
+MISSING_COLUMN = 'Missing'
+MISSING_MARK = 'X'
+
+
+def roster_frame(rosters: dict, first_name: str, last_name: str) -> pd.DataFrame:
+    """
+Put the students of every section in one data frame
+    :param rosters: Dictionary of section name to the data frame of students in that section
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :return: Data frame with the section, last name and first name of each student, in section order
+    """
+    frames = [pd.DataFrame({SECTION_COLUMN: section,
+                            'Last Name': section_data[last_name].to_numpy(),
+                            'First Name': section_data[first_name].to_numpy()})
+              for section, section_data in rosters.items()]
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_missing_matrix(rosters: dict, class_tables: dict, first_name: str, last_name: str) -> pd.DataFrame:
+    """
+Find which students are missing each assignment. A student is missing an assignment when a row of the class table
+with the same first and last name has no submission, the same as in the report of each class file.
+    :param rosters: Dictionary of section name to the data frame of students in that section
+    :param class_tables: Dictionary of assignment name to a tuple of the class (grade center) data frame and the
+    header of its assignment column
+    :param first_name: The name of the column header for first names in the files
+    :param last_name: The name of the column header for last names in the files
+    :return: Data frame with a row per student (section, last name and first name) and a boolean column per assignment
+    """
+    with stage('match') as counts:
+        matrix = roster_frame(rosters, first_name=first_name, last_name=last_name)
+        students = pd.MultiIndex.from_arrays([matrix['Last Name'], matrix['First Name']])
+        named = (matrix['Last Name'].notna() & matrix['First Name'].notna()).to_numpy()  # Missing names never match
+        for assignment, (class_data, assignment_column) in class_tables.items():
+            not_submitted = class_data[class_data[assignment_column].isna()]
+            missing_names = pd.MultiIndex.from_arrays([not_submitted[last_name], not_submitted[first_name]])
+            matrix[assignment] = students.isin(missing_names) & named
+            counts['rows'] += class_data.shape[0]
+    return matrix
+
+
+def section_summary(matrix: pd.DataFrame, section: str) -> pd.DataFrame:
+    """
+Make the sheet of one section, listing the students missing any assignment
+    :param matrix: The matrix from build_missing_matrix
+    :param section: The section name
+    :return: Data frame with a mark for each missing assignment, the number missing per student and a total row
+    """
+    assignments = [column for column in matrix.columns if column not in (SECTION_COLUMN, 'Last Name', 'First Name')]
+    section_matrix = matrix[matrix[SECTION_COLUMN] == section]
+    missing = section_matrix[assignments]
+    section_matrix = section_matrix[missing.any(axis=1)]
+    missing = missing[missing.any(axis=1)]
+
+    summary = section_matrix[['Last Name', 'First Name']].copy()
+    for assignment in assignments:
+        summary[assignment] = missing[assignment].map({True: MISSING_MARK, False: None})
+    summary[MISSING_COLUMN] = missing.sum(axis=1)
+    totals = pd.DataFrame([['Total', None] + list(missing.sum(axis=0)) + [int(missing.to_numpy().sum())]],
+                          columns=summary.columns)
+    return pd.concat([summary, totals], ignore_index=True)
+
+
+def write_missing_matrix(matrix: pd.DataFrame, output_file: pathlib.Path) -> None:
+    """
+Write a workbook with a sheet per section that has missing assignments
+    :param matrix: The matrix from build_missing_matrix
+    :param output_file: The path to the output file
+    """
+    workbook = open_workbook(output_file)
+    for section in matrix[SECTION_COLUMN].unique():
+        with stage('frame'):
+            summary = section_summary(matrix, section)
+        if summary.shape[0] > 1:
+            write_sheet(workbook, sheet_name=section, df=summary)
+        else:
+            print(f"\tNo missing assignments in {section}")
+    with stage('save', files=1):
+        workbook.close()
+
+
+def save_missing_matrix(matrix: pd.DataFrame, matrix_file: pathlib.Path) -> None:
+    """
+Save the matrix so that later commands can use it without reading the Grade Center exports again
+    :param matrix: The matrix from build_missing_matrix
+    :param matrix_file: The path to save the matrix to
+    """
+    matrix.to_pickle(matrix_file)
+
+
+def load_missing_matrix(matrix_file: pathlib.Path) -> pd.DataFrame:
+    """
+Load a matrix saved by save_missing_matrix
+    :param matrix_file: The path the matrix was saved to
+    :return: The matrix
+    """
+    return pd.read_pickle(matrix_file)
+
+
+if __name__ == '__main__':
+    print("This file only contains the missing matrix for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
@@ -0,0 +1,173 @@
+"""Fuzzy matching of student names between Grade Center exports and section lists"""
+import difflib
+import re
+import unicodedata
+import pandas as pd
+
+from libs.timings import stage
+
+DEFAULT_THRESHOLD = 0.85  # Lowest score accepted as a fuzzy match
+BLOCK_LENGTH = 3  # Number of leading letters used to block names into candidate sets
+LAST_NAME_WEIGHT = 0.6  # Weight of the last name in the score, the first name makes up the remainder
+
+
+def normalize_name(name) -> str:
+    """
+Normalize a name for comparison by removing accents, case, punctuation (e.g. hyphens) and extra whitespace
+    :param name: The name to normalize
+    :return: The normalized name, an empty string for missing names
+    """
+    if pd.isna(name):
+        return ''
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(character for character in name if not unicodedata.combining(character))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name.casefold()).split())
+
+
+def first_name_score(first: str, other: str) -> float:
+    """
+Score how similar two normalized first names are. Preferred names which are a shortened form of the full name (e.g.
+'alex' and 'alexander') or one of its parts (e.g. 'maria' and 'maria jose') count as the same name.
+    :param first: A normalized first name
+    :param other: The other normalized first name
+    :return: Score from 0 to 1
+    """
+    if not first or not other:
+        return 0.0
+    short, long = sorted((first, other), key=len)
+    if len(short) >= 2 and (long.startswith(short) or short in long.split()):
+        return 1.0
+    return difflib.SequenceMatcher(None, first, other).ratio()
+
+
+class FuzzyNameIndex:
+    """Index of the normalized names of every section roster, blocked so only similar names are compared"""
+
+    def __init__(self, rosters: dict, first_name: str, last_name: str, threshold: float = DEFAULT_THRESHOLD):
+        """
+Index the students of every section
+        :param rosters: Dictionary of section name to the data frame of students in that section
+        :param first_name: The name of the column header for first names in the files
+        :param last_name: The name of the column header for last names in the files
+        :param threshold: Lowest score accepted as a fuzzy match
+        """
+        self.threshold = threshold
+        self.students = []  # (section, last, first, normalized last, normalized first) of each roster row
+        self.exact = {}  # (last, first) to the students with exactly that name
+        self.normalized = {}  # (normalized last, normalized first) to the students with that name
+        self.blocks = {}  # Block key to the students in the block
+        with stage('index names') as counts:
+            for section, section_data in rosters.items():
+                for first, last in zip(section_data[first_name], section_data[last_name]):
+                    if pd.isna(first) or pd.isna(last):
+                        continue
+                    student = len(self.students)
+                    norm_last, norm_first = normalize_name(last), normalize_name(first)
+                    self.students.append((section, last, first, norm_last, norm_first))
+                    self.exact.setdefault((last, first), []).append(student)
+                    self.normalized.setdefault((norm_last, norm_first), []).append(student)
+                    for key in self._block_keys(norm_last, norm_first):
+                        self.blocks.setdefault(key, []).append(student)
+                counts['rows'] += section_data.shape[0]
+
+    @staticmethod
+    def _block_keys(norm_last: str, norm_first: str) -> tuple:
+        """
+Get the blocks a name belongs to. Names are only compared with names that share a block: the start of the last name,
+or the start of the first name with the last initial (for a misspelled or changed last name).
+        :param norm_last: The normalized last name
+        :param norm_first: The normalized first name
+        :return: Tuple of block keys
+        """
+        last_letters = norm_last.replace(' ', '')
+        first_letters = norm_first.replace(' ', '')
+        return ('L' + last_letters[:BLOCK_LENGTH], 'F' + first_letters[:BLOCK_LENGTH] + last_letters[:1])
+
+    def best_matches(self, first, last) -> tuple:
+        """
+Find the roster students whose names are closest to a name which has no exact match
+        :param first: The first name to look up
+        :param last: The last name to look up
+        :return: Tuple of the list of best matching students (indexes into students) and their score, or an empty
+        list if no student scores at least the threshold
+        """
+        norm_last, norm_first = normalize_name(last), normalize_name(first)
+        if not norm_last or not norm_first:
+            return [], 0.0
+        if (norm_last, norm_first) in self.normalized:
+            return self.normalized[(norm_last, norm_first)], 1.0
+        candidates = set()
+        for key in self._block_keys(norm_last, norm_first):
+            candidates.update(self.blocks.get(key, ()))
+        best, best_score = [], self.threshold
+        last_matcher = difflib.SequenceMatcher(None, b=norm_last)  # Reused so norm_last is only analysed once
+        for student in candidates:
+            _, _, _, student_last, student_first = self.students[student]
+            last_matcher.set_seq1(student_last)
+            # Skip the full comparison when even a perfect first name could not reach the best score
+            if LAST_NAME_WEIGHT * last_matcher.real_quick_ratio() + 1 - LAST_NAME_WEIGHT < best_score:
+                continue
+            score = LAST_NAME_WEIGHT * last_matcher.ratio() + \
+                (1 - LAST_NAME_WEIGHT) * first_name_score(norm_first, student_first)
+            if score > best_score:
+                best, best_score = [student], score
+            elif score == best_score:
+                best.append(student)
+        return best, best_score if best else 0.0
+
+
+class FuzzyMatchCollector:
+    """Collect the roster students missing an assignment who only match a Grade Center row by a fuzzy match"""
+
+    def __init__(self, index: FuzzyNameIndex):
+        """
+Start collecting for a single class file
+        :param index: The index of the section rosters
+        """
+        self.index = index
+        self.claimed = set()  # Students with an exact match anywhere in the class file
+        # Student to the (score, submitted, class last, class first) of its best fuzzy match, where a submitted row
+        # wins a tie with a missing one
+        self.matches = {}
+
+    def add(self, class_data: pd.DataFrame, missing: pd.Series, first_name: str, last_name: str) -> None:
+        """
+Add the rows of the class file, which can be added in several parts. Every row without an exact match is matched,
+whether or not it was submitted, so a student who submitted under a variant of their name is not reported missing
+because of a weaker match with another row.
+        :param class_data: The data frame of the class (grade center) file
+        :param missing: Boolean series, aligned with class_data, which is true where the assignment is missing
+        :param first_name: The name of the column header for first names in the files
+        :param last_name: The name of the column header for last names in the files
+        """
+        with stage('fuzzy match', rows=class_data.shape[0]):
+            for first, last, is_missing in zip(class_data[first_name], class_data[last_name],
+                                               missing.to_numpy(dtype=bool)):
+                exact = self.index.exact.get((last, first))
+                if exact:
+                    self.claimed.update(exact)
+                    continue
+                students, score = self.index.best_matches(first, last)
+                match = (score, not is_missing, last, first)
+                for student in students:
+                    if student not in self.matches or match[:2] > self.matches[student][:2]:
+                        self.matches[student] = match
+
+    def results(self) -> dict:
+        """
+Get the fuzzy matches of students who do not have an exact match in the class file and whose best match is missing
+the assignment
+        :return: Dictionary of section name to a list of (roster last, roster first, class last, class first, score)
+        """
+        by_section = {}
+        for student, (score, submitted, class_last, class_first) in sorted(self.matches.items()):
+            if student in self.claimed or submitted:
+                continue
+            section, last, first, _, _ = self.index.students[student]
+            by_section.setdefault(section, []).append((last, first, class_last, class_first, score))
+        return by_section
+
+
+if __name__ == '__main__':
+    print("This file only contains the name matching for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
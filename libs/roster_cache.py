@@ -0,0 +1,125 @@
+"""Cache for parsed section rosters so each section list is only parsed once"""
+import hashlib
+import os
+import pathlib
+import pandas as pd
+
+from libs.helper_functions import read_csv_or_xls
+from libs.timings import stage
+
+CACHE_FOLDER = '.roster_cache'  # Created inside the folder holding the section lists
+
+# In-process memo of (resolved path, columns) to ((size, mtime), data frame)
+_memo = {}
+
+
+def file_fingerprint(file_location: pathlib.Path) -> dict:
+    """
+Get the values which identify the current contents of a file
+    :param file_location: The path to the file, or a zip_input.ZipMember (whose modification time is the archive's)
+    :return: Dictionary of the resolved path, size, modification time and SHA-256 hash of the file
+    """
+    stat = file_location.stat()
+    digest = hashlib.sha256(file_location.read_bytes()).hexdigest()
+    return {'path': str(file_location.resolve()),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha256': digest}
+
+
+def _cache_file(file_location: pathlib.Path, columns: list = None) -> pathlib.Path:
+    """
+Get the location of the on-disk cache entry for a roster file
+    :param file_location: The path to the roster file
+    :param columns: The columns read from the file
+    :return: Path of the cache entry
+    """
+    cache_key = repr((str(file_location.resolve()), columns))
+    path_hash = hashlib.sha1(cache_key.encode()).hexdigest()
+    return file_location.parent / CACHE_FOLDER / (path_hash + '.pkl')
+
+
+def _read_disk_cache(cache_file: pathlib.Path, fingerprint: dict):
+    """
+Read a roster from the on-disk cache
+    :param cache_file: The cache entry to read
+    :param fingerprint: The fingerprint of the roster file as it is now
+    :return: The cached data frame, or None if there is no valid entry
+    """
+    try:
+        with stage('roster cache', files=1):
+            entry = pd.read_pickle(cache_file)
+    except Exception:  # Missing, unreadable or written by an incompatible version
+        return None
+    if entry.get('fingerprint') != fingerprint:
+        return None
+    return entry['data']
+
+
+def _write_disk_cache(cache_file: pathlib.Path, fingerprint: dict, data: pd.DataFrame) -> None:
+    """
+Write a roster to the on-disk cache. Failing to write the cache is not an error.
+    :param cache_file: The cache entry to write
+    :param fingerprint: The fingerprint of the roster file that was parsed
+    :param data: The parsed roster
+    """
+    temp_file = cache_file.with_suffix('.tmp')
+    try:
+        cache_file.parent.mkdir(exist_ok=True)
+        pd.to_pickle({'fingerprint': fingerprint, 'data': data}, temp_file)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        pass
+
+
+def read_roster(file_location: pathlib.Path, columns: list = None, use_disk_cache: bool = True) -> pd.DataFrame:
+    """
+Read a section roster, reusing an earlier parse of the same file when it has not changed.
+    :param file_location: The path to the roster file, or a zip_input.ZipMember
+    :param columns: Column headers to read, all columns are read if not given
+    :param use_disk_cache: Whether to use the on-disk cache as well as the in-process memo
+    :return: Data frame containing contents of the roster file. This is a copy and can be modified.
+    """
+    columns = list(columns) if columns is not None else None
+    memo_key = (str(file_location.resolve()), repr(columns))
+    stat = file_location.stat()
+    stat_key = (stat.st_size, stat.st_mtime_ns)
+    if memo_key in _memo and _memo[memo_key][0] == stat_key:
+        return _memo[memo_key][1].copy()
+
+    data = None
+    if use_disk_cache:
+        fingerprint = file_fingerprint(file_location)
+        cache_file = _cache_file(file_location, columns)
+        data = _read_disk_cache(cache_file, fingerprint)
+        if data is None:
+            data = read_csv_or_xls(file_location, columns=columns)
+            _write_disk_cache(cache_file, fingerprint, data)
+    else:
+        data = read_csv_or_xls(file_location, columns=columns)
+
+    _memo[memo_key] = (stat_key, data)
+    return data.copy()
+
+
+def read_rosters(section_list: list, columns: list = None, use_disk_cache: bool = True) -> dict:
+    """
+Read every section roster in a list of files
+    :param section_list: List of roster files, as given by get_sorted_csv_or_xls
+    :param columns: Column headers to read, all columns are read if not given
+    :param use_disk_cache: Whether to use the on-disk cache as well as the in-process memo
+    :return: Dictionary of section name (file stem) to roster data frame, in the order of the list
+    """
+    return {file.stem: read_roster(file, columns=columns, use_disk_cache=use_disk_cache) for file in section_list}
+
+
+def clear_memo() -> None:
+    """
+Forget every roster held in the in-process memo
+    """
+    _memo.clear()
+
+
+if __name__ == '__main__':
+    print("This file only contains the roster cache for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
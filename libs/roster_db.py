@@ -0,0 +1,279 @@
+"""SQLite store of the section rosters, kept for the whole term and shared by every command"""
+import collections
+import datetime
+import hashlib
+import pathlib
+import sqlite3
+import pandas as pd
+
+from libs.helper_functions import get_sorted_csv_or_xls
+from libs.name_matching import normalize_name
+from libs.roster_cache import file_fingerprint, read_roster
+from libs.timings import stage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    first_name_first INTEGER NOT NULL,
+    first_name_column TEXT,
+    last_name_column TEXT
+);
+CREATE TABLE IF NOT EXISTS students (
+    section TEXT NOT NULL REFERENCES sections (name),
+    position INTEGER NOT NULL,
+    last_name TEXT,
+    first_name TEXT,
+    norm_last TEXT NOT NULL,
+    norm_first TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS students_by_section ON students (section, position);
+CREATE INDEX IF NOT EXISTS students_by_name ON students (norm_last, norm_first, section);
+CREATE TABLE IF NOT EXISTS imports (
+    id INTEGER PRIMARY KEY,
+    imported_at TEXT NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    import_id INTEGER NOT NULL REFERENCES imports (id),
+    section TEXT NOT NULL,
+    change TEXT NOT NULL CHECK (change IN ('add', 'drop')),
+    last_name TEXT,
+    first_name TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_by_import ON changes (import_id, section);
+"""
+# Columns added to the sections table after the first version, added to older databases when they are opened
+ADDED_SECTION_COLUMNS = ['first_name_column', 'last_name_column']
+
+
+def connect(db_file: pathlib.Path) -> sqlite3.Connection:
+    """
+Open the roster database, creating its tables if they do not exist yet
+    :param db_file: The path to the database file
+    :return: The connection, which must be closed once done
+    """
+    connection = sqlite3.connect(pathlib.Path(db_file))
+    connection.executescript(SCHEMA)
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(sections)")}
+    for column in ADDED_SECTION_COLUMNS:
+        if column not in columns:
+            # Left empty, so sections imported before the column existed are read again on the next import
+            connection.execute(f"ALTER TABLE sections ADD COLUMN {column} TEXT")
+    connection.commit()
+    return connection
+
+
+def _open_existing(db_file: pathlib.Path) -> sqlite3.Connection:
+    """
+Open a roster database that has already been imported into
+    :param db_file: The path to the database file
+    :return: The connection, which must be closed once done
+    """
+    db_file = pathlib.Path(db_file)
+    if not db_file.is_file():
+        raise RuntimeError(f"The roster database '{db_file}' does not exist. Create it with 'import-rosters' first")
+    connection = connect(db_file)
+    if connection.execute("SELECT COUNT(*) FROM sections").fetchone()[0] == 0:
+        connection.close()
+        raise RuntimeError(f"The roster database '{db_file}' has no sections. Add them with 'import-rosters'")
+    return connection
+
+
+def _name_value(name):
+    """
+Convert a name from a data frame to the value stored in the database
+    :param name: The name
+    :return: The name, or None if it is missing
+    """
+    return None if pd.isna(name) else name
+
+
+def _import_section(connection: sqlite3.Connection,
+                    import_id: int,
+                    section: str,
+                    roster: pd.DataFrame,
+                    first_name: str,
+                    last_name: str) -> tuple:
+    """
+Replace the students of one section, recording who was added and dropped since the last import
+    :param connection: The open database
+    :param import_id: The id of the import in the imports table
+    :param section: The section name
+    :param roster: The name columns of the section list
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :return: Tuple of the number of students added and dropped
+    """
+    old = collections.Counter(connection.execute(
+        "SELECT last_name, first_name FROM students WHERE section = ?", (section,)))
+    rows = [(_name_value(last), _name_value(first)) for last, first in zip(roster[last_name], roster[first_name])]
+    new = collections.Counter(rows)
+    added, dropped = new - old, old - new
+    connection.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?)",
+                           [(import_id, section, change, last, first)
+                            for change, names in (('add', added), ('drop', dropped))
+                            for last, first in names.elements()])
+
+    connection.execute("DELETE FROM students WHERE section = ?", (section,))
+    connection.executemany("INSERT INTO students VALUES (?, ?, ?, ?, ?, ?)",
+                           [(section, position, last, first, normalize_name(last), normalize_name(first))
+                            for position, (last, first) in enumerate(rows)])
+    return sum(added.values()), sum(dropped.values())
+
+
+def import_rosters(section_list_location: pathlib.Path,
+                   db_file: pathlib.Path,
+                   first_name: str,
+                   last_name: str,
+                   use_cache: bool = True,
+                   force: bool = False) -> int:
+    """
+Load the section lists into the roster database. Only the sections whose files changed since the last import are
+read, and the students added to and dropped from each section are recorded.
+    :param section_list_location: Folder (or zip archive) where lab section lists are stored
+    :param db_file: The path to the database file, which is created if it does not exist
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param force: Read every section list again, even if it has not changed
+    :return: 0 for success and other for failure
+    """
+    section_list = get_sorted_csv_or_xls(pathlib.Path(section_list_location))
+    connection = connect(db_file)
+    try:
+        with connection:  # One transaction, so a failed import leaves the database as it was
+            # A section is only read again if its file or the name columns read from it changed
+            stored = {name: (sha256, first, last) for name, sha256, first, last in connection.execute(
+                "SELECT name, sha256, first_name_column, last_name_column FROM sections")}
+            import_id = connection.execute(
+                "INSERT INTO imports (imported_at, source) VALUES (?, ?)",
+                (datetime.datetime.now().isoformat(timespec='seconds'), str(section_list_location))).lastrowid
+
+            changed = False
+            with stage('import rosters', files=len(section_list)) as counts:
+                for position, section_file in enumerate(section_list):
+                    section = section_file.stem
+                    sha256 = file_fingerprint(section_file)['sha256']
+                    if not force and stored.get(section) == (sha256, first_name, last_name):
+                        connection.execute("UPDATE sections SET position = ? WHERE name = ?", (position, section))
+                        continue
+                    roster = read_roster(section_file, columns=[first_name, last_name], use_disk_cache=use_cache)
+                    first_name_first = list(roster.columns).index(first_name) < list(roster.columns).index(last_name)
+                    added, dropped = _import_section(connection, import_id, section, roster,
+                                                     first_name=first_name, last_name=last_name)
+                    connection.execute("INSERT OR REPLACE INTO sections (name, position, source, sha256, "
+                                       "first_name_first, first_name_column, last_name_column) "
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       (section, position, str(section_file), sha256, int(first_name_first),
+                                        first_name, last_name))
+                    counts['rows'] += roster.shape[0]
+                    changed = True
+                    if section in stored:
+                        print(f"{section}: {added} added, {dropped} dropped")
+                    else:
+                        print(f"{section}: new section with {roster.shape[0]} students")
+
+                # Sections whose files are gone are dropped with all of their students
+                current = {section_file.stem for section_file in section_list}
+                for section in sorted(set(stored) - current):
+                    empty = pd.DataFrame({first_name: [], last_name: []})
+                    _, dropped = _import_section(connection, import_id, section, empty,
+                                                 first_name=first_name, last_name=last_name)
+                    connection.execute("DELETE FROM sections WHERE name = ?", (section,))
+                    print(f"{section}: removed, {dropped} dropped")
+                    changed = True
+        if not changed:
+            print(f"No section lists have changed since the last import into {db_file}")
+    finally:
+        connection.close()
+    return 0
+
+
+def load_rosters(db_file: pathlib.Path, first_name: str, last_name: str) -> dict:
+    """
+Read every section roster from the database
+    :param db_file: The path to the database file
+    :param first_name: The first name column header to use
+    :param last_name: The last name column header to use
+    :return: Dictionary of section name to a data frame of the name columns of that section, the same as reading the
+    section lists with roster_cache.read_rosters
+    """
+    connection = _open_existing(db_file)
+    try:
+        with stage('roster db') as counts:
+            sections = connection.execute(
+                "SELECT name, first_name_first FROM sections ORDER BY position").fetchall()
+            rows = collections.defaultdict(list)
+            for section, last, first in connection.execute(
+                    "SELECT section, last_name, first_name FROM students ORDER BY section, position"):
+                rows[section].append((last, first))
+            counts['rows'] = sum(len(names) for names in rows.values())
+    finally:
+        connection.close()
+
+    rosters = {}
+    for section, first_name_first in sections:
+        roster = pd.DataFrame(rows[section], columns=[last_name, first_name], dtype=object)
+        rosters[section] = roster[[first_name, last_name]] if first_name_first else roster
+    return rosters
+
+
+def roster_version(db_file: pathlib.Path) -> str:
+    """
+Get a value which changes whenever the rosters in the database change, for the build records of outputs
+    :param db_file: The path to the database file
+    :return: SHA-256 hash of the name, order, file hash and name columns of every section
+    """
+    connection = _open_existing(db_file)
+    try:
+        sections = connection.execute(
+            "SELECT name, sha256, first_name_first, first_name_column, last_name_column FROM sections "
+            "ORDER BY position").fetchall()
+    finally:
+        connection.close()
+    return hashlib.sha256(repr(sections).encode()).hexdigest()
+
+
+def roster_changes(db_file: pathlib.Path, section: str = None) -> pd.DataFrame:
+    """
+Get the students added to and dropped from each section by every import
+    :param db_file: The path to the database file
+    :param section: Only get the changes of this section
+    :return: Data frame with the time of the import, section, change ('add' or 'drop'), last name and first name
+    """
+    connection = _open_existing(db_file)
+    query = "SELECT imports.imported_at, changes.section, changes.change, changes.last_name, changes.first_name " \
+            "FROM changes JOIN imports ON imports.id = changes.import_id"
+    parameters = ()
+    if section is not None:
+        query += " WHERE changes.section = ?"
+        parameters = (section,)
+    try:
+        return pd.read_sql_query(query + " ORDER BY changes.import_id, changes.rowid", connection, params=parameters)
+    finally:
+        connection.close()
+
+
+def find_student(db_file: pathlib.Path, first, last) -> list:
+    """
+Find the sections of a student by name, ignoring differences in case, accents, punctuation and whitespace
+    :param db_file: The path to the database file
+    :param first: The first name of the student
+    :param last: The last name of the student
+    :return: List of (section, last name, first name) of the matching students
+    """
+    connection = _open_existing(db_file)
+    try:
+        return connection.execute(
+            "SELECT section, last_name, first_name FROM students WHERE norm_last = ? AND norm_first = ? "
+            "ORDER BY section, position", (normalize_name(last), normalize_name(first))).fetchall()
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    print("This file only contains the roster database for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
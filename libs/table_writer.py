@@ -0,0 +1,86 @@
+"""Plain CSV, Parquet and JSON Lines output for results which are read by scripts instead of being printed"""
+import os
+import pathlib
+import shutil
+import pandas as pd
+
+from libs.timings import stage
+from libs.xlsx_writer import write_workbook
+
+OUTPUT_FORMATS = ['xlsx', 'csv', 'parquet', 'jsonl']
+SECTION_COLUMN = 'Section'  # Column naming the section of each row in single file formats
+
+
+def output_path(output_file: pathlib.Path, output_format: str) -> pathlib.Path:
+    """
+Get the path written for an output in a format
+    :param output_file: The output file as given for Excel output
+    :param output_format: One of OUTPUT_FORMATS
+    :return: The output file with the extension of the format, or a folder named after the file for CSV output
+    """
+    if output_format == 'xlsx':
+        return output_file
+    if output_format == 'csv':
+        return output_file.with_suffix('')
+    return output_file.with_suffix('.' + output_format)
+
+
+def write_tables(tables: dict, output_file: pathlib.Path, output_format: str) -> None:
+    """
+Write a table per section without any formatting. CSV output is a folder with a file per section, the other formats
+are a single file with a column naming the section of each row.
+    :param tables: Dictionary of section name to the data frame of that section
+    :param output_file: The path to write to, from output_path
+    :param output_format: 'csv', 'parquet' or 'jsonl'
+    """
+    if output_format not in OUTPUT_FORMATS[1:]:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS[1:])}")
+
+    if output_format == 'csv':
+        # Written to a new folder which then replaces the old one, so sections no longer in the output are removed
+        temp_folder = output_file.with_name(f".{output_file.name}.tmp")
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        temp_folder.mkdir(parents=True)
+        with stage('save', files=len(tables)):
+            for section, section_data in tables.items():
+                section_data.to_csv(temp_folder / f"{section}.csv", index=False)
+            if output_file.is_dir():
+                shutil.rmtree(output_file)
+            os.replace(temp_folder, output_file)
+        return
+
+    with stage('frame'):
+        frames = [section_data.assign(**{SECTION_COLUMN: section}) for section, section_data in tables.items()]
+        if frames:
+            combined = pd.concat(frames, ignore_index=True)
+            combined = combined[[SECTION_COLUMN] + [column for column in combined.columns if column != SECTION_COLUMN]]
+        else:
+            combined = pd.DataFrame(columns=[SECTION_COLUMN])
+    with stage('save', files=1):
+        if output_format == 'parquet':
+            try:
+                combined.to_parquet(output_file, index=False)
+            except ImportError as error:
+                raise RuntimeError("Writing Parquet files needs a working install of pyarrow or fastparquet. Install "
+                                   "one with 'pip install pyarrow', or use a different --format") from error
+        else:
+            combined.to_json(output_file, orient='records', lines=True, force_ascii=False)
+
+
+def write_output(tables: dict, output_file: pathlib.Path, output_format: str = 'xlsx', **sheet_options) -> None:
+    """
+Write a table per section in any of the output formats
+    :param tables: Dictionary of section name to the data frame of that section
+    :param output_file: The path to write to, from output_path
+    :param output_format: One of OUTPUT_FORMATS
+    :param sheet_options: Options for the Excel sheets (see xlsx_writer.write_sheet), not used by the other formats
+    """
+    if output_format == 'xlsx':
+        write_workbook(tables, output_file, **sheet_options)
+    else:
+        write_tables(tables, output_file, output_format)
+
+
+if __name__ == '__main__':
+    print("This file only contains the table output for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
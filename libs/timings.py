@@ -0,0 +1,123 @@
+"""Per-stage timing, file and row counts and peak memory for the 3201 utility"""
+import contextlib
+import json
+import time
+import tracemalloc
+
+# Whether stages are being recorded, set by enable
+_enabled = False
+# Every stage recorded so far, in the order they finished
+_records = []
+# Stages which are currently running, innermost last
+_running = []
+
+
+def enable(trace_memory: bool = True) -> None:
+    """
+Start recording stages
+    :param trace_memory: Whether to record the peak memory of each stage. This slows down the run.
+    """
+    global _enabled
+    _enabled = True
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def is_enabled() -> bool:
+    """
+Check whether stages are being recorded
+    :return: True if enable has been called
+    """
+    return _enabled
+
+
+@contextlib.contextmanager
+def stage(name: str, files: int = 0, rows: int = 0):
+    """
+Record the wall time, counts and peak memory of a stage. Does nothing unless enable has been called.
+    :param name: The name of the stage, stages with the same name are added together in the report
+    :param files: Number of files handled by the stage
+    :param rows: Number of rows handled by the stage
+    :return: Dictionary of the 'files' and 'rows' counts, which can be updated inside of the stage
+    """
+    counts = {'files': files, 'rows': rows}
+    if not _enabled:
+        yield counts
+        return
+    record = {'stage': name, 'peak_memory': 0}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    _running.append(record)
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        _running.pop()
+        if tracing:
+            # Nested stages reset the peak, so the peak of a stage includes the peaks of the stages inside of it
+            record['peak_memory'] = max(record['peak_memory'], tracemalloc.get_traced_memory()[1])
+            if _running:
+                _running[-1]['peak_memory'] = max(_running[-1]['peak_memory'], record['peak_memory'])
+        record.update(counts)
+        _records.append(record)
+
+
+def collect() -> list:
+    """
+Take the stages recorded so far, e.g. to send them from a worker process back to the main process
+    :return: List of the recorded stages, which are removed from this process
+    """
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def merge(records: list) -> None:
+    """
+Add stages recorded in another process
+    :param records: Stages returned by collect in the other process
+    """
+    _records.extend(records)
+
+
+def summary() -> list:
+    """
+Add together the recorded stages with the same name
+    :return: List of dictionaries with the stage name, number of calls, total seconds, files, rows and peak memory
+    """
+    stages = {}
+    for record in _records:
+        total = stages.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0, 'seconds': 0.0,
+                                                    'files': 0, 'rows': 0, 'peak_memory': 0})
+        total['calls'] += 1
+        total['seconds'] += record['seconds']
+        total['files'] += record['files']
+        total['rows'] += record['rows']
+        total['peak_memory'] = max(total['peak_memory'], record['peak_memory'])
+    return list(stages.values())
+
+
+def print_summary() -> None:
+    """
+Print the recorded stages as a table
+    """
+    print(f"\n{'Stage':<24}{'Calls':>8}{'Time (s)':>12}{'Files':>8}{'Rows':>10}{'Peak (MB)':>12}")
+    for total in summary():
+        print(f"{total['stage']:<24}{total['calls']:>8}{total['seconds']:>12.4f}{total['files']:>8}"
+              f"{total['rows']:>10}{total['peak_memory'] / 2 ** 20:>12.2f}")
+
+
+def write_json(file_location) -> None:
+    """
+Write the recorded stages as JSON
+    :param file_location: The path of the JSON file
+    """
+    with open(file_location, 'w') as file:
+        json.dump({'summary': summary(), 'stages': _records}, file, indent=2)
+
+
+if __name__ == '__main__':
+    print("This file only contains the stage timings for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
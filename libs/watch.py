@@ -0,0 +1,300 @@
+"""Watch the input folders and check pre-labs again as new files land, keeping the section rosters in memory"""
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import select
+import struct
+import time
+import zipfile
+
+from libs.build_manifest import input_fingerprints
+from libs.helper_functions import build_name_index, get_sorted_csv_or_xls
+from libs.main_functions import create_sign_in_sheets, check_pre_labs, check_class_files, pre_lab_record, \
+    section_inputs, section_rosters
+
+INPUT_SUFFIXES = ('.csv', '.xls')  # The files get_sorted_csv_or_xls finds in an input folder
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie and name length of struct inotify_event
+
+
+class InotifyWatcher:
+    """Watch folders for changed files using Linux inotify"""
+
+    def __init__(self, folders: list):
+        """
+Start watching folders
+        :param folders: The folders to watch
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}
+        for folder in folders:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"Could not watch '{folder}'")
+            self.folders[wd] = pathlib.Path(folder)
+
+    def changes(self, timeout: float) -> set:
+        """
+Wait for files to change
+        :param timeout: The longest time to wait in seconds
+        :return: Set of the paths which changed, empty if nothing changed before the timeout
+        """
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            if name and wd in self.folders:
+                changed.add(self.folders[wd] / name)
+        return changed
+
+    def close(self) -> None:
+        """
+Stop watching
+        """
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watch folders for changed files by comparing the size and modification time of each file"""
+
+    def __init__(self, folders: list, interval: float = 1.0):
+        """
+Start watching folders
+        :param folders: The folders to watch
+        :param interval: Time between checks of the folders in seconds
+        """
+        self.folders = [pathlib.Path(folder) for folder in folders]
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> dict:
+        """
+Get the size and modification time of every file in the watched folders
+        :return: Dictionary of path to (size, modification time)
+        """
+        snapshot = {}
+        for folder in self.folders:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[pathlib.Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: float) -> set:
+        """
+Wait for files to change
+        :param timeout: The longest time to wait in seconds
+        :return: Set of the paths which changed, empty if nothing changed before the timeout
+        """
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._snapshot()
+        changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(path) != self.snapshot.get(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """
+Stop watching
+        """
+
+
+def make_watcher(folders: list, poll: bool = False, interval: float = 1.0):
+    """
+Watch folders with inotify if it is available, otherwise by polling
+    :param folders: The folders to watch
+    :param poll: Always poll, e.g. for network drives where inotify does not see changes
+    :param interval: Time between checks of the folders in seconds when polling
+    :return: The watcher
+    """
+    if not poll:
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError, TypeError):  # Not Linux, or no inotify in the C library
+            pass
+    return PollingWatcher(folders, interval=interval)
+
+
+def wait_for_changes(watcher, debounce: float, other_inputs: set = frozenset()) -> set:
+    """
+Wait for input files to change, then keep collecting changes until none have been seen for the debounce time so
+that a file which is still being written is only handled once
+    :param watcher: The watcher to wait on
+    :param debounce: How long the folders must be quiet in seconds
+    :param other_inputs: Resolved paths of inputs which are not CSV or XLS files, e.g. the roster database
+    :return: Set of the changed input files
+    """
+    changed = set()
+    while not changed:
+        changed = watcher.changes(timeout=60)
+    while True:
+        more = watcher.changes(timeout=debounce)
+        if not more:
+            break
+        changed |= more
+    return {path for path in changed if (path.suffix in INPUT_SUFFIXES and not path.name.startswith('.'))
+            or path.resolve() in other_inputs}
+
+
+def watched_folder(location: pathlib.Path) -> pathlib.Path:
+    """
+Get the folder to watch for an input location. Files such as zip archives and the roster database are watched
+through the folder holding them, as changes to a watched file itself are not reported with a file name.
+    :param location: An input folder, or a file such as a zip archive or the roster database
+    :return: The folder to watch
+    """
+    return location if location.is_dir() else location.parent
+
+
+def is_input_of(path: pathlib.Path, location: pathlib.Path) -> bool:
+    """
+Check whether a changed file belongs to an input location
+    :param path: The changed file
+    :param location: An input folder, or a file such as a zip archive or the roster database
+    :return: True if the file is in the folder, or is the file itself
+    """
+    location = location.resolve()
+    if location.is_dir():
+        return path.parent.resolve() == location
+    return path.resolve() == location
+
+
+def class_files(prelab_location: pathlib.Path) -> list:
+    """
+Get every class file in the pre-lab location
+    :param prelab_location: Folder or zip archive where pre-lab assignment files are added
+    :return: List of the class files, empty if there are none
+    """
+    try:
+        return get_sorted_csv_or_xls(prelab_location)
+    except (RuntimeError, OSError, zipfile.BadZipFile):  # No class files yet, or an archive still being written
+        return []
+
+
+def watch(section_list_location: pathlib.Path,
+          file_suffix: str,
+          prelab_location: pathlib.Path,
+          output_location: pathlib.Path,
+          assignment_index: int,
+          first_name: str,
+          last_name: str,
+          sign_in_file: pathlib.Path = None,
+          use_cache: bool = True,
+          debounce: float = 1.0,
+          poll: bool = False,
+          poll_interval: float = 1.0,
+          roster_db: pathlib.Path = None
+          ) -> int:
+    """
+Check pre-labs, then check them again whenever files are added to or changed in the input folders. Runs until stopped
+with Ctrl+C.
+    :param section_list_location: Folder where lab section lists are stored
+    :param file_suffix: Output file suffix to be added to input. Output file is always .xlsx file.
+    :param prelab_location: Folder where pre-lab assignment files are added
+    :param output_location: Location to save output file(s)
+    :param assignment_index: Column index where assignment grades/submissions are stored (column H/7 usually)
+    :param first_name: The first name column header
+    :param last_name: The last name column header
+    :param sign_in_file: If given, the sign-in sheets are also written here whenever the section lists change
+    :param use_cache: Whether to reuse rosters parsed by earlier runs
+    :param debounce: How long the folders must be quiet before files are checked, in seconds
+    :param poll: Always poll the folders instead of using inotify
+    :param poll_interval: Time between checks of the folders in seconds when polling
+    :param roster_db: If given, the rosters are read from this database (see import-rosters) instead of the section
+    lists, and are reloaded whenever it changes
+    :return: 0 once stopped
+    """
+    settings = {'file_suffix': file_suffix,
+                'output_location': output_location,
+                'assignment_index': assignment_index,
+                'first_name': first_name,
+                'last_name': last_name}
+
+    output_location.mkdir(parents=True, exist_ok=True)
+
+    # Bring every output up to date before watching
+    if sign_in_file:
+        create_sign_in_sheets(section_list_location, sign_in_file, first_name=first_name, last_name=last_name,
+                              use_cache=use_cache, roster_db=roster_db)
+    check_pre_labs(section_list_location, file_suffix, prelab_location, output_location, assignment_index,
+                   first_name=first_name, last_name=last_name, use_cache=use_cache, roster_db=roster_db)
+    section_list, roster_options = section_inputs(section_list_location, roster_db)
+    rosters = section_rosters(section_list, first_name=first_name, last_name=last_name, use_cache=use_cache,
+                              roster_db=roster_db)
+    name_index = build_name_index(rosters, first_name=first_name, last_name=last_name)
+    section_fingerprints = input_fingerprints(section_list)
+
+    # With a roster database, it is watched instead of the section lists
+    roster_location = roster_db if roster_db else section_list_location
+    other_inputs = {location.resolve() for location in (roster_location, prelab_location) if not location.is_dir()}
+    folders = list(dict.fromkeys(watched_folder(location) for location in (roster_location, prelab_location)))
+    watcher = make_watcher(folders, poll=poll, interval=poll_interval)
+    print(f"\nWatching '{roster_location}' and '{prelab_location}' for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            changed = {path for path in wait_for_changes(watcher, debounce, other_inputs)
+                       if is_input_of(path, roster_location) or is_input_of(path, prelab_location)}
+            if not changed:
+                continue
+            sections_changed = any(is_input_of(path, roster_location) for path in changed)
+
+            if sections_changed:
+                # Unchanged section lists come from the memo, so only the changed ones are parsed again
+                print("\nRosters changed, reloading them")
+                try:
+                    section_list, roster_options = section_inputs(section_list_location, roster_db)
+                except RuntimeError as error:  # Every section list was removed, or the database was emptied
+                    print(f"\t{error}")
+                    continue
+                rosters = section_rosters(section_list, first_name=first_name, last_name=last_name,
+                                          use_cache=use_cache, roster_db=roster_db)
+                name_index = build_name_index(rosters, first_name=first_name, last_name=last_name)
+                section_fingerprints = input_fingerprints(section_list)
+                if sign_in_file:
+                    create_sign_in_sheets(section_list_location, sign_in_file, first_name=first_name,
+                                          last_name=last_name, use_cache=use_cache, roster_db=roster_db)
+                lab_list = class_files(prelab_location)
+            elif prelab_location.is_dir():
+                lab_list = sorted(path for path in changed if path.exists())
+            else:  # Every file of a zip archive is checked again when the archive changes
+                lab_list = class_files(prelab_location)
+
+            records = {class_file: pre_lab_record(section_fingerprints, class_file, assignment_index,
+                                                  first_name=first_name, last_name=last_name,
+                                                  roster_options=roster_options)
+                       for class_file in lab_list if class_file.exists()}
+            failures = check_class_files(records, list(rosters), name_index, settings)
+            if failures:
+                print(f"\n{failures} of {len(records)} files could not be checked")
+            print("\nWatching for changes (Ctrl+C to stop)")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    print("This file only contains the watch mode for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
@@ -0,0 +1,133 @@
+"""Fast Excel output that streams data frames straight to XlsxWriter"""
+import math
+import pathlib
+import weakref
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from libs.timings import stage
+
+MAX_PAGE_WIDTH = 114.33  # Total column width that fits on a single landscape page
+MAX_PAGE_HEIGHT = 537  # Total row height that fits on a single landscape page
+HEADER_HEIGHT = 15  # Height of the header row
+
+# The same header style pandas uses in DataFrame.to_excel
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+BORDER_FORMAT = {'border': 1}
+
+# Formats made for each workbook, so a format is only added once per workbook
+_workbook_formats = weakref.WeakKeyDictionary()
+
+
+def workbook_formats(workbook: xlsxwriter.Workbook) -> dict:
+    """
+Get the formats used for sheets in a workbook, creating them the first time the workbook is used
+    :param workbook: The workbook to get formats for
+    :return: Dictionary with the 'header' and 'border' formats
+    """
+    if workbook not in _workbook_formats:
+        _workbook_formats[workbook] = {'header': workbook.add_format(HEADER_FORMAT),
+                                       'border': workbook.add_format(BORDER_FORMAT)}
+    return _workbook_formats[workbook]
+
+
+def column_widths(df: pd.DataFrame) -> list:
+    """
+Get the width needed to fit the text of each column in a single pass over the data
+    :param df: The data frame to measure
+    :return: List with the width of each column, including a little extra space
+    """
+    header_lengths = [len(str(col)) for col in df.columns]
+    if df.shape[0] == 0:
+        return [length + 1 for length in header_lengths]
+    cell_lengths = np.char.str_len(df.to_numpy(dtype=object).astype(str)).max(axis=0)
+    return [int(max(cell_length, header_length)) + 1
+            for cell_length, header_length in zip(cell_lengths, header_lengths)]
+
+
+def open_workbook(output_file) -> xlsxwriter.Workbook:
+    """
+Open a workbook that writes each row out as soon as it is complete, so memory does not grow with the sheet size
+    :param output_file: The path (or in-memory buffer) to write the workbook to
+    :return: The opened workbook, which must be closed to save it
+    """
+    if isinstance(output_file, (str, pathlib.Path)):
+        options = {'constant_memory': True}
+    else:
+        options = {'in_memory': True}  # Buffers can not use constant memory mode
+    options['default_date_format'] = 'yyyy-mm-dd hh:mm:ss'
+    return xlsxwriter.Workbook(output_file, options)
+
+
+def write_sheet(workbook: xlsxwriter.Workbook,
+                sheet_name: str,
+                df: pd.DataFrame,
+                max_last: bool = False,
+                fill_page: bool = False,
+                landscape: bool = False) -> None:
+    """
+Write a data frame to a new sheet with bordered columns sized to fit the text
+    :param workbook: The workbook to add the sheet to
+    :param sheet_name: The name of the sheet
+    :param df: The data frame to write
+    :param max_last: Whether or not to maximize width of last column to fill the page
+    :param fill_page: Whether or not to make rows as tall as possible while remaining on a single page
+    :param landscape: Whether or not to set the sheet to landscape
+    """
+    with stage('format'):
+        formats = workbook_formats(workbook)
+        worksheet = workbook.add_worksheet(sheet_name)
+        if landscape:
+            worksheet.set_landscape()
+
+        # Column formatting has to be set before any rows are written in constant memory mode
+        widths = column_widths(df)
+        if max_last and widths:
+            # set width to all fit on one page. 0.65 * idx is the error per column
+            last = len(widths) - 1
+            widths[last] = MAX_PAGE_WIDTH - (sum(widths) - widths[last]) - 0.65 * last
+        for idx, width in enumerate(widths):
+            worksheet.set_column(idx, idx, width, formats['border'])
+
+        row_height = None
+        if fill_page and df.shape[0]:
+            row_height = math.floor((MAX_PAGE_HEIGHT - HEADER_HEIGHT) / df.shape[0])
+
+    # Stream the header then each row in order
+    with stage('write', rows=df.shape[0]):
+        for col, header in enumerate(df.columns):
+            worksheet.write(0, col, header, formats['header'])
+        missing = df.isna().to_numpy()
+        for row, (values, row_missing) in enumerate(zip(df.itertuples(index=False, name=None), missing), start=1):
+            if row_height is not None:
+                worksheet.set_row(row, row_height)
+            for col, value in enumerate(values):
+                if not row_missing[col]:
+                    worksheet.write(row, col, value)
+
+
+def write_workbook(tables: dict,
+                   output_file,
+                   max_last: bool = False,
+                   fill_page: bool = False,
+                   landscape: bool = False) -> None:
+    """
+Write a workbook with a sheet per data frame, using the same options for every sheet (see write_sheet)
+    :param tables: Dictionary of sheet name to the data frame to write on it
+    :param output_file: The path (or in-memory buffer) to write the workbook to
+    :param max_last: Whether or not to maximize width of last column to fill the page
+    :param fill_page: Whether or not to make rows as tall as possible while remaining on a single page
+    :param landscape: Whether or not to set the sheets to landscape
+    """
+    workbook = open_workbook(output_file)
+    for sheet_name, df in tables.items():
+        write_sheet(workbook, sheet_name=sheet_name, df=df, max_last=max_last, fill_page=fill_page,
+                    landscape=landscape)
+    with stage('save', files=1):
+        workbook.close()
+
+
+if __name__ == '__main__':
+    print("This file only contains the Excel writer for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
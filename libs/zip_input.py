@@ -0,0 +1,131 @@
+"""Input files read straight out of zip archives, such as the downloads from BlackBoard"""
+import contextlib
+import dataclasses
+import os
+import pathlib
+import types
+import zipfile
+
+IGNORED_FOLDERS = ('__MACOSX/',)  # Folders of metadata added by some zip tools
+
+
+@dataclasses.dataclass(frozen=True)
+class ZipMember:
+    """A file inside of a zip archive, with the parts of pathlib.Path used for input files"""
+    archive: pathlib.Path
+    member: str
+
+    @property
+    def name(self) -> str:
+        return pathlib.PurePosixPath(self.member).name
+
+    @property
+    def stem(self) -> str:
+        return pathlib.PurePosixPath(self.member).stem
+
+    @property
+    def suffix(self) -> str:
+        return pathlib.PurePosixPath(self.member).suffix
+
+    @property
+    def parent(self) -> pathlib.Path:
+        """
+The folder holding the archive, e.g. for files written next to the inputs
+        """
+        return self.archive.parent
+
+    def __str__(self) -> str:
+        return f"{self.archive}/{self.member}"
+
+    def resolve(self):
+        """
+Get the member with the absolute path of the archive
+        :return: The resolved member
+        """
+        return ZipMember(self.archive.resolve(), self.member)
+
+    def exists(self) -> bool:
+        """
+Check whether the archive exists and still holds the member
+        :return: True if the member can be read
+        """
+        try:
+            with zipfile.ZipFile(self.archive) as archive:
+                archive.getinfo(self.member)
+            return True
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return False
+
+    def stat(self):
+        """
+Get the size of the member and the modification time of the archive, which changes whenever a member changes
+        :return: Object with st_size and st_mtime_ns, like os.stat_result
+        """
+        with zipfile.ZipFile(self.archive) as archive:
+            size = archive.getinfo(self.member).file_size
+        return types.SimpleNamespace(st_size=size, st_mtime_ns=os.stat(self.archive).st_mtime_ns)
+
+    def read_bytes(self) -> bytes:
+        """
+Read the uncompressed contents of the member
+        :return: The contents
+        """
+        with zipfile.ZipFile(self.archive) as archive:
+            return archive.read(self.member)
+
+    @contextlib.contextmanager
+    def open(self):
+        """
+Open the member for reading, decompressing it as it is read
+        :return: Binary file object of the member, which is closed with the archive at the end of the with block
+        """
+        with zipfile.ZipFile(self.archive) as archive, archive.open(self.member) as file:
+            yield file
+
+
+def list_members(archive_location: pathlib.Path, suffixes: tuple) -> list:
+    """
+Get the files in a zip archive with one of the given extensions, including files in folders of the archive
+    :param archive_location: The path to the zip archive
+    :param suffixes: The extensions to include, e.g. ('.csv', '.xls')
+    :return: List of the members, sorted by file name
+    """
+    with zipfile.ZipFile(archive_location) as archive:
+        names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    members = [ZipMember(archive_location, name) for name in names
+               if not name.startswith(IGNORED_FOLDERS) and pathlib.PurePosixPath(name).suffix in suffixes]
+    members.sort(key=lambda member: (member.name, member.member))
+    return members
+
+
+def single_member(archive_location: pathlib.Path, suffixes: tuple) -> ZipMember:
+    """
+Get the only file of a zip archive with one of the given extensions, e.g. a download of a single file
+    :param archive_location: The path to the zip archive
+    :param suffixes: The extensions to look for
+    :return: The member
+    """
+    members = list_members(archive_location, suffixes)
+    if len(members) != 1:
+        raise RuntimeError("Expected a single file with extension '{0}' in '{1}', found {2}"
+                           .format("' or '".join(suffixes), str(archive_location), len(members)))
+    return members[0]
+
+
+@contextlib.contextmanager
+def open_input(file_location):
+    """
+Get something pandas can read an input file from, opening the member when the file is inside of a zip archive
+    :param file_location: The path to the file, or a ZipMember
+    :return: The path itself, or an open binary file object for a ZipMember
+    """
+    if isinstance(file_location, ZipMember):
+        with file_location.open() as file:
+            yield file
+    else:
+        yield file_location
+
+
+if __name__ == '__main__':
+    print("This file only contains the zip input for the 3201 utility. Run '3201_utility' to use this utility!")
+    exit(0)
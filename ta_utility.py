@@ -10,11 +10,20 @@ helper functions located in "libs/helper_functions.py".
 import argparse
 import pathlib
 
+# Stage timings
+from libs import timings
+
 # Custom argparse help formatter
 from libs.help_formatter import CustomHelpFormatter
 
-# Main functions
-from libs.main_functions import create_sign_in_sheets, check_pre_labs, make_checkoffs
+# The main functions import pandas, which is slow, so they are only imported once a subcommand runs. This keeps
+# '--help' and argument errors fast. Check with 'python benchmarks/check_startup.py' after adding imports here.
+
+# Output formats, the same as libs.table_writer.OUTPUT_FORMATS (which is not imported for the reason above)
+OUTPUT_FORMATS = ['xlsx', 'csv', 'parquet', 'jsonl']
+ROSTER_DB_HELP = "Read the rosters from a database made by 'import-rosters' instead of the section lists"
+FORMAT_HELP = "Output format. Only xlsx is formatted for printing, csv writes a folder with a file per section and " \
+              "parquet and jsonl write one file with a 'Section' column (default: xlsx)"
 
 
 def select_function(input_arguments: argparse.Namespace) -> int:
@@ -23,11 +32,27 @@ The main function which selects the arguments run
     :param input_arguments: Arguments parsed in
     :return: exit code
     """
+    from libs.main_functions import create_sign_in_sheets, check_pre_labs, check_pre_labs_matrix, make_checkoffs
+
     if input_arguments.subcommand == 'sign-in':
         return create_sign_in_sheets(section_list_location=input_arguments.section_lists,
                                      sign_in_file=input_arguments.output_file,
                                      first_name=input_arguments.first_name,
-                                     last_name=input_arguments.last_name)
+                                     last_name=input_arguments.last_name,
+                                     use_cache=input_arguments.use_cache,
+                                     force=input_arguments.force,
+                                     output_format=input_arguments.output_format,
+                                     roster_db=input_arguments.roster_db)
+    elif input_arguments.subcommand == 'check-pre-labs' and input_arguments.matrix:
+        return check_pre_labs_matrix(section_list_location=input_arguments.section_lists,
+                                     prelab_location=input_arguments.prelab_location,
+                                     output_location=input_arguments.output_location,
+                                     assignment_index=7,  # Default position of assignment in eLearning documents
+                                     first_name=input_arguments.first_name,
+                                     last_name=input_arguments.last_name,
+                                     use_cache=input_arguments.use_cache,
+                                     force=input_arguments.force,
+                                     roster_db=input_arguments.roster_db)
     elif input_arguments.subcommand == 'check-pre-labs':
         return check_pre_labs(section_list_location=input_arguments.section_lists,
                               file_suffix=input_arguments.file_suffix,
@@ -35,19 +60,100 @@ The main function which selects the arguments run
                               output_location=input_arguments.output_location,
                               assignment_index=7,  # Default position of assignment in eLearning documents
                               first_name=input_arguments.first_name,
-                              last_name=input_arguments.last_name)
+                              last_name=input_arguments.last_name,
+                              use_cache=input_arguments.use_cache,
+                              jobs=input_arguments.jobs,
+                              force=input_arguments.force,
+                              chunksize=input_arguments.chunk_size,
+                              fuzzy_threshold=input_arguments.fuzzy,
+                              output_format=input_arguments.output_format,
+                              roster_db=input_arguments.roster_db)
     elif input_arguments.subcommand == 'make-checkoffs':
         return make_checkoffs(section_list_location=input_arguments.section_lists,
                               checkoff_file=input_arguments.output_file,
                               checkoff_list_file=input_arguments.list_file,
                               checkoff_header=input_arguments.checkoff_header,
                               first_name=input_arguments.first_name,
-                              last_name=input_arguments.last_name)
+                              last_name=input_arguments.last_name,
+                              use_cache=input_arguments.use_cache,
+                              all_headers=input_arguments.all_headers,
+                              jobs=input_arguments.jobs,
+                              force=input_arguments.force,
+                              output_format=input_arguments.output_format,
+                              roster_db=input_arguments.roster_db)
+    elif input_arguments.subcommand == 'import-rosters':
+        from libs.roster_db import import_rosters
+        return import_rosters(section_list_location=input_arguments.section_lists,
+                              db_file=input_arguments.roster_db,
+                              first_name=input_arguments.first_name,
+                              last_name=input_arguments.last_name,
+                              use_cache=input_arguments.use_cache,
+                              force=input_arguments.force)
+    elif input_arguments.subcommand == 'watch':
+        from libs.watch import watch
+        return watch(section_list_location=input_arguments.section_lists,
+                     file_suffix=input_arguments.file_suffix,
+                     prelab_location=input_arguments.prelab_location,
+                     output_location=input_arguments.output_location,
+                     assignment_index=7,  # Default position of assignment in eLearning documents
+                     first_name=input_arguments.first_name,
+                     last_name=input_arguments.last_name,
+                     sign_in_file=input_arguments.sign_in_file,
+                     use_cache=input_arguments.use_cache,
+                     debounce=input_arguments.debounce,
+                     poll=input_arguments.poll,
+                     poll_interval=input_arguments.poll_interval,
+                     roster_db=input_arguments.roster_db)
     else:
         print(f"Command '{input_arguments.subcommand}' is not recognized")
         return 1
 
 
+def matrix_conflicts(input_arguments: argparse.Namespace) -> list:
+    """
+Find the check-pre-labs options which are not used when writing the report of every assignment (--matrix)
+    :param input_arguments: Arguments parsed in
+    :return: List of the options given which --matrix does not support
+    """
+    if input_arguments.subcommand != 'check-pre-labs' or not input_arguments.matrix:
+        return []
+    unsupported = {'--format': input_arguments.output_format != 'xlsx',
+                   '--jobs': input_arguments.jobs != 1,
+                   '--chunk-size': input_arguments.chunk_size is not None,
+                   '--fuzzy': input_arguments.fuzzy is not None}
+    return [option for option, given in unsupported.items() if given]
+
+
+def run_subcommand(input_arguments: argparse.Namespace) -> int:
+    """
+Run the selected function, recording stage timings and a profile if they were asked for
+    :param input_arguments: Arguments parsed in
+    :return: exit code
+    """
+    if input_arguments.timings or input_arguments.timings_json:
+        timings.enable()
+    profiler = None
+    if input_arguments.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    with timings.stage(input_arguments.subcommand):
+        exit_code = select_function(input_arguments)
+
+    if profiler:
+        profiler.disable()
+        input_arguments.profile.mkdir(parents=True, exist_ok=True)
+        profile_file = input_arguments.profile / f"{input_arguments.subcommand}.prof"
+        profiler.dump_stats(profile_file)
+        print(f"\nProfile written to {profile_file}")
+    if timings.is_enabled():
+        timings.print_summary()
+        if input_arguments.timings_json:
+            timings.write_json(input_arguments.timings_json)
+    return exit_code
+
+
 """
 The argument parser setup for the utility.
 The main functions can be found in libs.main_functions. Some helper functions are located in libs.helper_functions
@@ -70,6 +176,26 @@ if __name__ == '__main__':
                         type=str,
                         default='Last Name',
                         help="default: 'Last Name'")
+    parser.add_argument('--no-roster-cache',
+                        dest='use_cache',
+                        action='store_false',
+                        help="Parse every section list again instead of reusing the cached rosters")
+    parser.add_argument('--force',
+                        action='store_true',
+                        help="Write every output, even those whose inputs have not changed since they were written")
+    parser.add_argument('--timings',
+                        action='store_true',
+                        help="Print the time, file and row counts and peak memory of each stage of the run")
+    parser.add_argument('--timings-json',
+                        type=pathlib.Path,
+                        default=None,
+                        metavar='/path/to/timings.json',
+                        help="Also write the stage timings to a JSON file")
+    parser.add_argument('--profile',
+                        type=pathlib.Path,
+                        default=None,
+                        metavar='/path/to/profile/folder/',
+                        help="Write a cProfile dump of the run to '<folder>/<subcommand>.prof'")
 
     # Parser for creating sign in sheets
     # For git
@@ -85,6 +211,16 @@ if __name__ == '__main__':
                                 default='output/sign_ins.xlsx',
                                 metavar='/path/to/output/file.xlsx',
                                 help="default: 'output/sign_ins.xlsx'")
+    parser_sign_in.add_argument('-db', '--roster-db',
+                                type=pathlib.Path,
+                                default=None,
+                                metavar='/path/to/rosters.db',
+                                help=ROSTER_DB_HELP)
+    parser_sign_in.add_argument('-f', '--format',
+                                dest='output_format',
+                                choices=OUTPUT_FORMATS,
+                                default='xlsx',
+                                help=FORMAT_HELP)
 
     # Parser for creating check off sheets
     parser_checkoff = subparsers.add_parser('make-checkoffs',
@@ -101,6 +237,16 @@ if __name__ == '__main__':
                                  default='output/checkoffs.xlsx',
                                  metavar='/path/to/output/file.xlsx',
                                  help="default: 'output/checkoffs.xlsx'")
+    parser_checkoff.add_argument('-db', '--roster-db',
+                                 type=pathlib.Path,
+                                 default=None,
+                                 metavar='/path/to/rosters.db',
+                                 help=ROSTER_DB_HELP)
+    parser_checkoff.add_argument('-f', '--format',
+                                 dest='output_format',
+                                 choices=OUTPUT_FORMATS,
+                                 default='xlsx',
+                                 help=FORMAT_HELP)
     parser_checkoff.add_argument('-cl', '--checkoff-list',
                                  type=pathlib.Path,
                                  default='checkoff_lists/3201_checkoff_lists.csv',
@@ -108,12 +254,24 @@ if __name__ == '__main__':
                                  dest='list_file',
                                  help="A file containing a list or table of checkoffs \
                                  (default: 'checkoff_lists/3201_checkoff_lists.csv')")
-    parser_checkoff.add_argument('-ch', '--checkoff-header',
-                                 type=str,
-                                 default=None,
-                                 metavar='checkoff_header',
-                                 help="By default, the first column in the list file will be selected but any string"
-                                      "that matches a column header ni the checkoff file works.")
+    parser_checkoff_headers = parser_checkoff.add_mutually_exclusive_group()
+    parser_checkoff_headers.add_argument('-ch', '--checkoff-header',
+                                         type=str,
+                                         nargs='+',
+                                         default=None,
+                                         metavar='checkoff_header',
+                                         help="By default, the first column in the list file will be selected but any "
+                                              "string that matches a column header in the checkoff file works. Giving "
+                                              "more than one header makes one file per header.")
+    parser_checkoff_headers.add_argument('-a', '--all',
+                                         action='store_true',
+                                         dest='all_headers',
+                                         help="Make one file for every column header in the checkoff file")
+    parser_checkoff.add_argument('-j', '--jobs',
+                                 type=int,
+                                 default=1,
+                                 metavar='N',
+                                 help="Number of checkoff files to write in parallel (default: 1)")
 
     # Parser for checking if pre-labs are complete
     parser_prelab = subparsers.add_parser('check-pre-labs',
@@ -140,10 +298,114 @@ if __name__ == '__main__':
                                default='output/',
                                metavar='/location/to/save/output/',
                                help="Where to save the output (default: 'output/')")
+    parser_prelab.add_argument('-db', '--roster-db',
+                               type=pathlib.Path,
+                               default=None,
+                               metavar='/path/to/rosters.db',
+                               help=ROSTER_DB_HELP)
+    parser_prelab.add_argument('-f', '--format',
+                               dest='output_format',
+                               choices=OUTPUT_FORMATS,
+                               default='xlsx',
+                               help=FORMAT_HELP + ". Cannot be used with --matrix")
+    parser_prelab.add_argument('-j', '--jobs',
+                               type=int,
+                               default=1,
+                               metavar='N',
+                               help="Number of assignment files to check in parallel (default: 1)")
+    parser_prelab.add_argument('-cs', '--chunk-size',
+                               type=int,
+                               default=None,
+                               metavar='rows',
+                               help="Read CSV assignment files this many rows at a time, so very large exports "
+                                    "do not have to fit in memory")
+    parser_prelab.add_argument('-fz', '--fuzzy',
+                               type=float,
+                               nargs='?',
+                               const=0.85,
+                               default=None,
+                               metavar='threshold',
+                               help="Also match students whose names differ slightly between the section lists and "
+                                    "Grade Center (case, accents, hyphens, preferred first names), scoring at least "
+                                    "the threshold from 0 to 1 (default: 0.85). Fuzzy matches are marked in the report")
+    parser_prelab.add_argument('-m', '--matrix',
+                               action='store_true',
+                               help="Write one report of every assignment, with the number of assignments each "
+                                    "student is missing, instead of a report per assignment file. Cannot be used "
+                                    "with --format, --jobs, --chunk-size or --fuzzy")
+
+    # Parser for loading the section lists into the roster database
+    parser_import = subparsers.add_parser('import-rosters',
+                                          help="Load the section lists into a roster database, recording students "
+                                               "added and dropped since the last import.",
+                                          formatter_class=CustomHelpFormatter)
+    parser_import.add_argument('-sl', '--section-lists',
+                               type=pathlib.Path,
+                               default='section_lists/',
+                               metavar='/path/to/section/files/',
+                               help="default: 'section_lists/'"
+                               )
+    parser_import.add_argument('-db', '--roster-db',
+                               type=pathlib.Path,
+                               default='rosters.db',
+                               metavar='/path/to/rosters.db',
+                               help="default: 'rosters.db'")
+
+    # Parser for watching the input folders and checking pre-labs as files are added
+    parser_watch = subparsers.add_parser('watch',
+                                         help="Check pre-labs again whenever the section or pre-lab files change.",
+                                         formatter_class=CustomHelpFormatter)
+    parser_watch.add_argument('-sl', '--section-lists',
+                              type=pathlib.Path,
+                              default='section_lists/',
+                              metavar='/path/to/section/files/',
+                              help="default: 'section_lists/"
+                              )
+    parser_watch.add_argument('-su', '--file-suffix',
+                              type=str,
+                              default='_Report',
+                              metavar='file[_suffix].xlsx',
+                              help="default: '_Report'")
+    parser_watch.add_argument('-pl', '--prelab-location',
+                              type=pathlib.Path,
+                              default='pre_lab_lists/',
+                              metavar='/path/to/prelab/grade/files/',
+                              help="default: 'pre_lab_lists/'")
+    parser_watch.add_argument('-o', '--output-location',
+                              type=pathlib.Path,
+                              default='output/',
+                              metavar='/location/to/save/output/',
+                              help="Where to save the output (default: 'output/')")
+    parser_watch.add_argument('-db', '--roster-db',
+                              type=pathlib.Path,
+                              default=None,
+                              metavar='/path/to/rosters.db',
+                              help=ROSTER_DB_HELP + ", reloading them whenever the database changes")
+    parser_watch.add_argument('-si', '--sign-in-file',
+                              type=pathlib.Path,
+                              default=None,
+                              metavar='/path/to/output/file.xlsx',
+                              help="Also write the sign-in sheets here whenever the section lists change")
+    parser_watch.add_argument('-d', '--debounce',
+                              type=float,
+                              default=1.0,
+                              metavar='seconds',
+                              help="How long the folders must be quiet before checking the files (default: 1.0)")
+    parser_watch.add_argument('--poll',
+                              action='store_true',
+                              help="Check the folders for changes on a timer instead of using inotify")
+    parser_watch.add_argument('--poll-interval',
+                              type=float,
+                              default=1.0,
+                              metavar='seconds',
+                              help="Time between checks of the folders when polling (default: 1.0)")
 
     # args = parser.parse_args(['check-pre-labs'])
     # args = parser.parse_args(['sign-ins', '-o', './output/fall2021_sign_in.xlsx'])
     # args = parser.parse_args(['make-checkoffs', '-o', 'Lab3Checkoffs.xlsx'])
     # args = parser.parse_args(['make-checkoffs', '-ch', 'Lab 12', '-o', 'output/checkoff12.xlsx'])
     args = parser.parse_args()
-    exit(select_function(args))
+    conflicts = matrix_conflicts(args)
+    if conflicts:
+        parser_prelab.error(f"--matrix cannot be used with {', '.join(conflicts)}")
+    exit(run_subcommand(args))
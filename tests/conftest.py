@@ -0,0 +1,5 @@
+"""Make the libs package importable when the tests are run from any folder"""
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
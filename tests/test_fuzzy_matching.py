@@ -0,0 +1,41 @@
+"""Check that fuzzy matching only reports students whose best matching Grade Center row is missing the assignment"""
+import numpy as np
+import pandas as pd
+
+from libs.api import missing_assignments
+
+FIRST = 'First Name'
+LAST = 'Last Name'
+
+
+def check(roster: list, class_rows: list) -> dict:
+    """
+Run the pre-lab check with fuzzy matching on one section
+    :param roster: List of (last, first) names of the section
+    :param class_rows: List of (last, first, grade) rows of the class file, where a NaN grade is missing
+    :return: Dictionary of section name to the report of missing students
+    """
+    rosters = {'Sec01': pd.DataFrame(roster, columns=[LAST, FIRST])}
+    class_table = pd.DataFrame(class_rows, columns=[LAST, FIRST, 'Pre-lab'])
+    return missing_assignments(rosters, class_table, first_name=FIRST, last_name=LAST, assignment_index=2,
+                               fuzzy_threshold=0.85)
+
+
+def test_submitted_variant_beats_missing_variant_of_same_score():
+    report = check([('Smith', 'John')], [('SMITH', 'John', 10.0), ('smith', 'john', np.nan)])
+    assert report == {}
+
+
+def test_submitted_match_beats_weaker_missing_match():
+    report = check([('Lee', 'Al')], [('Lee', 'Alan', 10.0), ('Leeds', 'Albert', np.nan)])
+    assert report == {}
+
+
+def test_best_missing_match_is_reported():
+    report = check([('Garcia', 'Ana')], [('Garcias', 'Ana', np.nan), ('garcia', 'ana', np.nan)])
+    assert report['Sec01'].values.tolist() == [['Garcia', 'Ana', 'Fuzzy: garcia, ana (1.00)']]
+
+
+def test_exact_submission_is_never_reported():
+    report = check([('Park', 'Di')], [('Park', 'Di', 10.0), ('park', 'di', np.nan)])
+    assert report == {}
@@ -0,0 +1,82 @@
+"""Check that matching through the name index gives the same results as the original nested loops"""
+import numpy as np
+import pandas as pd
+
+from libs.helper_functions import build_name_index, collect_missing
+
+FIRST = 'First Name'
+LAST = 'Last Name'
+ASSIGNMENT = 'Pre-lab'
+
+
+def nested_loop_missing(rosters: dict, class_data: pd.DataFrame) -> dict:
+    """
+The matching check_pre_labs did before the name index, kept to compare against
+    :param rosters: Dictionary of section name to the data frame of students in that section
+    :param class_data: The data frame of the class (grade center) file
+    :return: Dictionary of section name to a list of (last, first) names missing the assignment
+    """
+    prelab_bool = pd.isna(class_data[ASSIGNMENT])
+    missing_by_section = {}
+    for section, section_data in rosters.items():
+        last_list = []
+        first_list = []
+        for index_class in range(class_data.shape[0]):
+            for index_section in range(section_data.shape[0]):
+                lab_first = class_data[FIRST][index_class]
+                lab_last = class_data[LAST][index_class]
+                section_first = section_data[FIRST][index_section]
+                section_last = section_data[LAST][index_section]
+                if (section_first == lab_first) & (section_last == lab_last) & prelab_bool[index_class]:
+                    last_list.append(lab_last)
+                    first_list.append(lab_first)
+        if last_list:
+            missing_by_section[section] = list(zip(last_list, first_list))
+    return missing_by_section
+
+
+def indexed_missing(rosters: dict, class_data: pd.DataFrame) -> dict:
+    """
+The matching check_pre_labs does now
+    :param rosters: Dictionary of section name to the data frame of students in that section
+    :param class_data: The data frame of the class (grade center) file
+    :return: Dictionary of section name to a list of (last, first) names missing the assignment
+    """
+    name_index = build_name_index(rosters, first_name=FIRST, last_name=LAST)
+    return collect_missing(class_data, pd.isna(class_data[ASSIGNMENT]), name_index, first_name=FIRST, last_name=LAST)
+
+
+def roster(*names) -> pd.DataFrame:
+    return pd.DataFrame(names, columns=[LAST, FIRST])
+
+
+def test_duplicate_nan_and_shared_names():
+    rosters = {
+        'Sec01': roster(('Smith', 'Ann'), ('Smith', 'Ann'), ('Jones', np.nan), ('Lee', 'Bo')),
+        'Sec02': roster(('Smith', 'Ann'), (np.nan, 'Cy'), ('Park', 'Di'), (np.nan, np.nan)),
+        'Sec03': roster(('Lee', 'Bo'), ('Park', 'Di'), ('Ng', 'Ed')),
+    }
+    class_data = pd.DataFrame({
+        LAST: ['Park', 'Smith', 'Jones', np.nan, 'Lee', 'Ng', np.nan, 'Smith', 'Ng'],
+        FIRST: ['Di', 'Ann', np.nan, 'Cy', 'Bo', 'Ed', np.nan, 'Ann', 'Ed'],
+        ASSIGNMENT: [np.nan, np.nan, np.nan, np.nan, np.nan, 90.0, np.nan, np.nan, np.nan],
+    })
+    expected = nested_loop_missing(rosters, class_data)
+    assert indexed_missing(rosters, class_data) == expected
+    # NaN names never match, duplicated roster rows are reported once per row, shared names in every section
+    assert expected['Sec01'] == [('Smith', 'Ann'), ('Smith', 'Ann'), ('Lee', 'Bo'), ('Smith', 'Ann'), ('Smith', 'Ann')]
+    assert expected['Sec03'] == [('Park', 'Di'), ('Lee', 'Bo'), ('Ng', 'Ed')]
+
+
+def test_random_rosters():
+    generator = np.random.default_rng(3201)
+    lasts = np.array(['Smith', 'Lee', 'Park', 'Ng', np.nan], dtype=object)
+    firsts = np.array(['Ann', 'Bo', 'Cy', np.nan], dtype=object)
+    rosters = {f'Sec{section:02}': roster(*zip(generator.choice(lasts, 15), generator.choice(firsts, 15)))
+               for section in range(1, 5)}
+    class_data = pd.DataFrame({
+        LAST: generator.choice(lasts, 40),
+        FIRST: generator.choice(firsts, 40),
+        ASSIGNMENT: np.where(generator.random(40) < 0.5, np.nan, 10.0),
+    })
+    assert indexed_missing(rosters, class_data) == nested_loop_missing(rosters, class_data)
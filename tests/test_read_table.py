@@ -0,0 +1,23 @@
+"""Check that every CSV parser finds the same missing cells"""
+import pandas as pd
+import pytest
+
+from libs import helper_functions
+from libs.helper_functions import read_csv_or_xls
+
+EXPORT = ("Last Name,First Name,Username,Pre-lab\n"
+          "Smith,Ann,u1,Needs Grading\n"
+          "Lee,Bo,u2,\n"
+          "Park,Di,u3,10\n")
+
+
+@pytest.mark.parametrize('engine', [None, 'pyarrow'])
+def test_blank_cell_in_text_assignment_column_is_missing(tmp_path, monkeypatch, engine):
+    if engine:
+        pytest.importorskip('pyarrow.csv', exc_type=ImportError)
+    monkeypatch.setattr(helper_functions, 'CSV_ENGINE', engine)
+    export = tmp_path / 'PL1.csv'
+    export.write_text(EXPORT)
+    data = read_csv_or_xls(export)
+    assert pd.isna(data['Pre-lab']).tolist() == [False, True, False]
+    assert data['Last Name'].tolist() == ['Smith', 'Lee', 'Park']